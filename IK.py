@@ -1,10 +1,273 @@
-# Stub for Inverse Kinematics calculations.
-def calculate_ik(target_position):
-    print(f"Calculating IK for target position: {target_position}")
-    # Return dummy joint angles for testing.
-    return [0, 0, 0, 0, 0, 0]
+"""Forward and inverse kinematics for the 6-joint STS3215 (SO-100 style) arm.
+
+Motors 1-4 (shoulder pan, shoulder lift, elbow flex, wrist flex) place the
+gripper. Motor 5 (wrist roll) and motor 6 (gripper) don't move the grasp
+point, so IK keeps them at their current values.
+
+Model: pan rotates about the vertical axis. Lift, elbow and wrist flex are
+parallel pitch joints in the arm's vertical plane. Joint angles are zero
+with the arm pointing straight up, and positive angles tip it forward.
+Positions are in millimetres in the base frame, with x forward at zero pan
+and z up from the table.
+
+Everything works on batches: arrays of shape (N, 4) radians, or (N, 6)
+motor ticks, in and out.
+"""
+import time
+import numpy as np
+
+TICKS_PER_REV = 4096
+ARM_JOINTS = 4  # Motors that affect the grasp point
+
+# Geometry (mm). Nominal SO-100 values, not measured on this arm.
+SHOULDER_HEIGHT = 120.0  # Table to shoulder-lift axis
+UPPER_ARM = 116.0  # Shoulder-lift axis to elbow axis
+FOREARM = 135.0  # Elbow axis to wrist-flex axis
+GRIPPER_LENGTH = 100.0  # Wrist-flex axis to grasp point
+LINKS = np.array([UPPER_ARM, FOREARM, GRIPPER_LENGTH])
+
+# Calibration: tick reading at zero angle and direction of each arm joint.
+# The pitch joints are fitted so the recorded grasps (the gripper closing in
+# keys 3, 5 and 7) come out about 20 mm above the table; bench_ik.py checks
+# this. Pan and the link lengths can't be fitted from recorded ticks alone.
+JOINT_ZERO_TICKS = np.array([2048, 1777, 1647, 2827])
+JOINT_SIGNS = np.array([1, 1, 1, -1])
+# Three grasps don't pin the geometry down (fits leaving one out disagree by
+# hundreds of ticks), so IK results must not reach the arm yet. Set this only
+# after measuring the arm with bench_ik.py's table check still passing; until
+# then utils/pick_planner.py refuses to plan.
+CALIBRATED = False
+JOINT_MIN_TICKS = np.array([600, 600, 600, 600])
+JOINT_MAX_TICKS = np.array([3500, 3500, 3500, 3500])
+DEFAULT_WRIST_ROLL = 2048
+DEFAULT_GRIPPER = 1031
+
+# Solver defaults
+MAX_ITERATIONS = 100
+TOLERANCE_MM = 1.0
+DAMPING = 10.0  # mm; larger is more stable near singularities, slower to converge
+MAX_STEP = 0.2  # rad per joint per iteration
+LUT_SHAPE = (16, 16, 8)  # Workspace table resolution (lift, elbow, wrist)
+LUT_CELL_MM = 5.0  # Cell size of the table's (reach, height) index
+
+
+def ticks_to_radians(ticks):
+    """Convert (..., 4 or more) motor ticks to arm joint angles (..., 4)"""
+    ticks = np.asarray(ticks, dtype=np.float64)[..., :ARM_JOINTS]
+    return JOINT_SIGNS * (ticks - JOINT_ZERO_TICKS) * (2 * np.pi / TICKS_PER_REV)
+
+
+def radians_to_ticks(angles):
+    """Convert (..., 4) arm joint angles to motor ticks (rounded integers)"""
+    ticks = JOINT_ZERO_TICKS + JOINT_SIGNS * np.asarray(angles) * (TICKS_PER_REV / (2 * np.pi))
+    return np.rint(ticks).astype(np.int64)
+
+
+def joint_limits():
+    """Lower and upper joint limits in radians, shape (4,) each"""
+    a, b = ticks_to_radians(JOINT_MIN_TICKS), ticks_to_radians(JOINT_MAX_TICKS)
+    return np.minimum(a, b), np.maximum(a, b)
+
+
+def _planar(q):
+    # Cumulative pitch angles of the three links and their sin/cos
+    cumulative = np.cumsum(q[..., 1:4], axis=-1)
+    return np.sin(cumulative), np.cos(cumulative)
+
+
+def forward_kinematics(q):
+    """Grasp-point positions (N, 3) in mm for joint angles q (N, 4)"""
+    q = np.atleast_2d(q)
+    s, c = _planar(q)
+    r = s @ LINKS
+    z = SHOULDER_HEIGHT + c @ LINKS
+    return np.stack([r * np.cos(q[:, 0]), r * np.sin(q[:, 0]), z], axis=-1)
+
+
+def gripper_pitch(q):
+    """Gripper angle from vertical (N,), the sum of the three pitch joints"""
+    return np.atleast_2d(q)[:, 1:4].sum(axis=-1)
+
+
+def forward_kinematics_ticks(ticks):
+    """Grasp-point positions (N, 3) in mm for motor ticks (N, 6)"""
+    return forward_kinematics(ticks_to_radians(np.atleast_2d(ticks)))
+
+
+def jacobian(q):
+    """Analytic position Jacobian (N, 3, 4) in mm/rad"""
+    q = np.atleast_2d(q)
+    s, c = _planar(q)
+    # Sensitivity of reach r and height z to each pitch joint: link k moves
+    # with every joint up to and including k
+    weighted_c = c * LINKS
+    weighted_s = s * LINKS
+    dr = np.cumsum(weighted_c[:, ::-1], axis=-1)[:, ::-1]
+    dz = -np.cumsum(weighted_s[:, ::-1], axis=-1)[:, ::-1]
+    r = weighted_s.sum(axis=-1)
+    cos_pan, sin_pan = np.cos(q[:, 0]), np.sin(q[:, 0])
+
+    J = np.zeros((q.shape[0], 3, ARM_JOINTS))
+    J[:, 0, 0] = -r * sin_pan
+    J[:, 1, 0] = r * cos_pan
+    J[:, 0, 1:] = dr * cos_pan[:, None]
+    J[:, 1, 1:] = dr * sin_pan[:, None]
+    J[:, 2, 1:] = dz
+    return J
+
+
+_lut = None
+
+
+def workspace_lut():
+    """Pitch-joint grid, its (reach, height) positions and a cell index, built once and cached.
+
+    Pan only turns the arm's vertical plane, so the table covers the three
+    pitch joints at zero pan and lut_seeds solves pan exactly. Grid points
+    stay off the joint limits, where the clipped solver tends to stick. Each
+    LUT_CELL_MM square of the (reach, height) plane stores the index of its
+    nearest grid point, so a lookup is a single array access per target.
+    """
+    global _lut
+    if _lut is None:
+        lower, upper = joint_limits()
+        # n interior points per axis, none on the limits
+        axes = [np.linspace(lo, hi, n + 2)[1:-1] for lo, hi, n in zip(lower[1:], upper[1:], LUT_SHAPE)]
+        grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, ARM_JOINTS - 1)
+        s, c = _planar(np.concatenate([np.zeros((grid.shape[0], 1)), grid], axis=-1))
+        planar = np.stack([s @ LINKS, c @ LINKS], axis=-1)  # reach, height above the shoulder
+        squared_norms = (planar ** 2).sum(axis=-1)
+
+        reach = LINKS.sum()
+        centres = np.arange(-reach, reach + LUT_CELL_MM, LUT_CELL_MM)
+        cells = np.stack(np.meshgrid(centres, centres, indexing="ij"), axis=-1).reshape(-1, 2)
+        nearest = np.empty(cells.shape[0], dtype=np.int32)
+        for start in range(0, cells.shape[0], 1024):
+            # |p - c|^2 without the |c|^2 term, which doesn't change the argmin
+            distances = squared_norms[None, :] - 2 * cells[start:start + 1024] @ planar.T
+            nearest[start:start + 1024] = np.argmin(distances, axis=-1)
+        _lut = (grid, planar, nearest.reshape(len(centres), len(centres)))
+    return _lut
+
+
+def lut_seeds(targets):
+    """Two workspace-table seeds (N, 4) per target: the closer one first.
+
+    Each target is reachable facing it (pan towards it, positive reach) or
+    facing away (pan opposite, leaning back), when the pan limits allow it.
+    """
+    grid, planar, nearest = workspace_lut()
+    targets = np.atleast_2d(targets)
+    lower, upper = joint_limits()
+    reach = LINKS.sum()
+    pan = np.arctan2(targets[:, 1], targets[:, 0])
+    radius = np.hypot(targets[:, 0], targets[:, 1])
+    height = targets[:, 2] - SHOULDER_HEIGHT
+
+    seeds, distances = [], []
+    for facing in (1, -1):
+        branch_pan = pan if facing == 1 else np.mod(pan + 2 * np.pi, 2 * np.pi) - np.pi
+        clipped_pan = np.clip(branch_pan, lower[0], upper[0])
+        point = np.stack([facing * radius, height], axis=-1)
+        cell = np.rint((np.clip(point, -reach, reach) + reach) / LUT_CELL_MM).astype(np.int64)
+        index = nearest[cell[:, 0], cell[:, 1]]
+        seeds.append(np.concatenate([clipped_pan[:, None], grid[index]], axis=-1))
+        # In-plane miss plus the chord swept by any pan the limits cut off
+        miss = np.linalg.norm(planar[index] - point, axis=-1)
+        distances.append(miss + 2 * radius * np.abs(np.sin((branch_pan - clipped_pan) / 2)))
+    swap = (distances[1] < distances[0])[:, None]
+    return np.where(swap, seeds[1], seeds[0]), np.where(swap, seeds[0], seeds[1])
+
+
+def _damped_least_squares(targets, q, pitch, max_iterations, tolerance, damping):
+    lower, upper = joint_limits()
+    damping_sq = damping ** 2
+    active = np.ones(q.shape[0], dtype=bool)
+    for _ in range(max_iterations):
+        qa = q[active]
+        error = targets[active] - forward_kinematics(qa)
+        J = jacobian(qa)
+        if pitch is not None:
+            # Pitch error in radians is scaled to be comparable with millimetres
+            error = np.concatenate([error, (pitch[active] - gripper_pitch(qa))[:, None] * GRIPPER_LENGTH], axis=-1)
+            pitch_row = np.broadcast_to(np.array([0.0, 1.0, 1.0, 1.0]) * GRIPPER_LENGTH, (qa.shape[0], 1, ARM_JOINTS))
+            J = np.concatenate([J, pitch_row], axis=1)
+        done = np.linalg.norm(error, axis=-1) < tolerance
+        if done.all():
+            break
+        JJt = J @ J.transpose(0, 2, 1) + damping_sq * np.eye(J.shape[1])
+        step = (J.transpose(0, 2, 1) @ np.linalg.solve(JJt, error[..., None]))[..., 0]
+        step = np.clip(step, -MAX_STEP, MAX_STEP)
+        step[done] = 0.0
+        q[active] = np.clip(qa + step, lower, upper)
+        # Stop iterating targets that have converged
+        indices = np.flatnonzero(active)
+        active[indices[done]] = False
+        if not active.any():
+            break
+    return q
+
+
+def solve_ik(targets, q0=None, pitch=None, max_iterations=MAX_ITERATIONS,
+             tolerance=TOLERANCE_MM, damping=DAMPING, use_lut=True):
+    """Solve IK for a batch of target positions.
+
+    targets: (N, 3) mm. q0: (N, 4) or (4,) warm-start angles, usually the
+    current joint state; without it the best workspace-table seed is used.
+    Unsolved targets are retried from the remaining table seeds. pitch:
+    optional (N,) or scalar gripper angle from vertical. Returns (angles (N, 4), position error (N,) mm, converged (N,)).
+    """
+    targets = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+    n = targets.shape[0]
+    if pitch is not None:
+        pitch = np.broadcast_to(np.asarray(pitch, dtype=np.float64), (n,))
+    seeds = list(lut_seeds(targets)) if use_lut else []
+    if q0 is not None:
+        q = np.array(np.broadcast_to(q0, (n, ARM_JOINTS)), dtype=np.float64)
+    elif seeds:
+        q = seeds.pop(0)
+    else:
+        q = np.zeros((n, ARM_JOINTS))
+    q = _damped_least_squares(targets, q, pitch, max_iterations, tolerance, damping)
+    error = np.linalg.norm(forward_kinematics(q) - targets, axis=-1)
+
+    # Retry unsolved targets from the remaining table seeds, keeping the best result
+    for seed in seeds:
+        retry = np.flatnonzero(error >= tolerance)
+        if not retry.size:
+            break
+        q_retry = _damped_least_squares(targets[retry], seed[retry],
+                                        None if pitch is None else pitch[retry],
+                                        max_iterations, tolerance, damping)
+        error_retry = np.linalg.norm(forward_kinematics(q_retry) - targets[retry], axis=-1)
+        better = error_retry < error[retry]
+        q[retry[better]] = q_retry[better]
+        error[retry[better]] = error_retry[better]
+    return q, error, error < tolerance
+
+
+def calculate_ik(target_position, current_ticks=None, pitch=None):
+    """Motor ticks for all six motors that put the grasp point at target_position (mm).
+
+    current_ticks (6 values) warm-starts the solver and supplies wrist roll and
+    gripper, which IK leaves unchanged. Raises ValueError if the target is
+    out of reach.
+    """
+    q0 = None
+    roll, gripper = DEFAULT_WRIST_ROLL, DEFAULT_GRIPPER
+    if current_ticks is not None:
+        q0 = ticks_to_radians(current_ticks)
+        roll, gripper = current_ticks[4], current_ticks[5]
+    q, error, converged = solve_ik([target_position], q0=q0, pitch=pitch)
+    if not converged[0]:
+        raise ValueError(f"Target {list(target_position)} is out of reach (closest {error[0]:.1f} mm away)")
+    return [int(tick) for tick in radians_to_ticks(q[0])] + [int(roll), int(gripper)]
+
 
 # Example usage:
 if __name__ == "__main__":
-    angles = calculate_ik([100, 200, 300])
-    print("Calculated joint angles:", angles)
\ No newline at end of file
+    home = [2167, 1528, 2610, 2932, 1887, 1031]
+    print("Grasp point at ACTIVE pose:", forward_kinematics_ticks(home)[0].round(1))
+    start = time.perf_counter()
+    angles = calculate_ik([200, 50, 150], current_ticks=home)
+    print(f"Calculated joint ticks: {angles} in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,114 @@
+"""Solve-time and accuracy benchmark for the batched IK solver in IK.py.
+
+Targets are generated by forward kinematics from random joint angles, so every
+target is reachable and the achieved error is the solver's error alone. The
+recorded waypoints in robot_sequences.json are also round-tripped (FK, then IK
+with the recorded gripper pitch, warm-started from the previous waypoint) to
+check that runtime targets can stand in for recorded positions. A large tick
+difference with a small mm error means the solver reached the same point on
+the other elbow branch.
+
+The table check puts the recorded grasps (where a pick sequence closes the
+gripper on the table) through forward kinematics. They must come out within
+GRASP_HEIGHT_MM of the table and within reach. IK.CALIBRATED must stay False
+while the check fails.
+
+    python bench_ik.py
+"""
+import json
+import time
+import numpy as np
+import IK
+from utils.pick_planner import grasp_segment
+
+BATCH_SIZES = [1, 10, 100, 1000]
+WARM_START_NOISE = 0.15  # rad, how far the warm start is from the answer
+SEED = 0
+PICK_KEYS = (3, 5, 7)  # main.py's pick_map; key 9 hands the object over in the air
+GRASP_HEIGHT_MM = (0.0, 60.0)  # Grasp point above the table, allowing for the object's height
+
+
+def table_check(sequences):
+    """Print recorded grasp heights; return True if all are at table height and within reach"""
+    print(f"{'key':>4}{'waypoint':>10}{'reach mm':>10}{'height mm':>11}")
+    passed = True
+    for sequence in sequences:
+        segment = grasp_segment(sequence["positions"])
+        if sequence["key"] not in PICK_KEYS or segment is None:
+            continue
+        closed = segment[1]
+        x, y, z = IK.forward_kinematics_ticks(sequence["positions"][closed])[0]
+        reach = np.hypot(np.hypot(x, y), z - IK.SHOULDER_HEIGHT)
+        ok = GRASP_HEIGHT_MM[0] <= z <= GRASP_HEIGHT_MM[1] and reach <= IK.LINKS.sum()
+        passed &= bool(ok)
+        print(f"{sequence['key']:>4}{closed:>10}{np.hypot(x, y):>10.1f}{z:>11.1f}{'' if ok else '  FAIL'}")
+    return passed
+
+
+def report(label, elapsed, n, error, converged):
+    print(f"{label:<28}{n:>6}{elapsed * 1000:>10.2f}{elapsed / n * 1e6:>10.1f}"
+          f"{converged.mean() * 100:>9.1f}%{np.median(error):>9.3f}{error.max():>9.2f}")
+
+
+def main():
+    rng = np.random.default_rng(SEED)
+    lower, upper = IK.joint_limits()
+
+    start = time.perf_counter()
+    IK.workspace_lut()
+    print(f"Workspace table: {np.prod(IK.LUT_SHAPE)} entries and index built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print()
+    print(f"{'mode':<28}{'N':>6}{'total ms':>10}{'us/target':>10}{'solved':>10}{'med mm':>9}{'max mm':>9}")
+
+    for n in BATCH_SIZES:
+        answers = rng.uniform(lower, upper, (n, IK.ARM_JOINTS))
+        targets = IK.forward_kinematics(answers)
+        warm = np.clip(answers + rng.normal(0, WARM_START_NOISE, answers.shape), lower, upper)
+
+        start = time.perf_counter()
+        _, error, converged = IK.solve_ik(targets, q0=warm)
+        report("warm start", time.perf_counter() - start, n, error, converged)
+
+        start = time.perf_counter()
+        _, error, converged = IK.solve_ik(targets)
+        report("workspace table seed", time.perf_counter() - start, n, error, converged)
+
+        start = time.perf_counter()
+        _, error, converged = IK.solve_ik(targets, q0=np.zeros(IK.ARM_JOINTS), use_lut=False)
+        report("zero seed, no table", time.perf_counter() - start, n, error, converged)
+
+    # Sequential single-target calls, as a control loop would make them
+    n = 100
+    answers = rng.uniform(lower, upper, (n, IK.ARM_JOINTS))
+    targets = IK.forward_kinematics(answers)
+    start = time.perf_counter()
+    results = [IK.solve_ik(target, q0=answer + 0.1) for target, answer in zip(targets, answers)]
+    error = np.array([result[1][0] for result in results])
+    converged = np.array([result[2][0] for result in results])
+    report("warm start, one at a time", time.perf_counter() - start, n, error, converged)
+
+    with open("robot_sequences.json") as file:
+        sequences = json.load(file)
+    print()
+    print("Recorded waypoints round-tripped through FK -> IK with pitch (warm start: previous waypoint)")
+    print(f"{'key':>4}{'waypoints':>11}{'max mm':>9}{'max ticks':>11}")
+    for sequence in sequences:
+        ticks = np.array(sequence["positions"])
+        targets = IK.forward_kinematics_ticks(ticks)
+        q0 = IK.ticks_to_radians(np.vstack([ticks[:1], ticks[:-1]]))
+        # Position alone leaves the wrist free; constrain the recorded gripper pitch too
+        pitch = IK.gripper_pitch(IK.ticks_to_radians(ticks))
+        q, error, _ = IK.solve_ik(targets, q0=q0, pitch=pitch)
+        tick_error = np.abs(IK.radians_to_ticks(q) - ticks[:, :IK.ARM_JOINTS]).max()
+        print(f"{sequence['key']:>4}{len(ticks):>11}{error.max():>9.2f}{tick_error:>11}")
+
+    print()
+    print(f"Table check: recorded grasps through FK, {GRASP_HEIGHT_MM[0]:.0f}-{GRASP_HEIGHT_MM[1]:.0f} mm above the table")
+    passed = table_check(sequences)
+    print(f"Table check {'passed' if passed else 'FAILED'}; IK.CALIBRATED = {IK.CALIBRATED}")
+    if IK.CALIBRATED and not passed:
+        print("IK.CALIBRATED is set but the geometry doesn't match the recorded grasps; clear it")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Timing jitter of the 20 Hz goal-position stream under load.
+
+Runs a standalone copy of the pacing loop in testv4.move_to_position (one goal
+write per step, paced against absolute deadlines, without the serial bus, the
+stop check or status updates) against a SimulatedMotorBus and records when
+each goal write actually happens. Keep the two in step when changing either.
+
+Load is a pure-Python worker standing in for JPEG encoding / Gradio request
+handling, run either as a thread in the motion process (shares the GIL, today's
+single-process layout) or as a separate process (the smartreach_launcher.py
+layout). Both the old sleep(delay) pacing and the deadline pacing are measured.
+
+Reported per case: period error (actual minus 50 ms between consecutive
+writes, p50/p99/max) and drift (how late the last write is against its
+schedule, which is what slows a whole sequence down).
+
+    python bench_motion_jitter.py
+    python bench_motion_jitter.py --seconds 10 --workers 2
+"""
+import argparse
+import multiprocessing
+import threading
+import time
+import numpy as np
+from utils.sim_arm import SimulatedMotorBus
+
+MOTOR_IDS = [1, 2, 3, 4, 5, 6]
+PERIOD = 0.05  # s, testv4 streams goals at 20 Hz
+
+
+def busy_work(stop):
+    """Pure-Python CPU load that holds the GIL between switch intervals"""
+    buffer = bytearray(64 * 1024)
+    while not stop.is_set():
+        for i in range(len(buffer)):
+            buffer[i] = (buffer[i] * 31 + i) & 0xFF
+
+
+def goal_loop(bus, ticks, deadline_pacing):
+    """Stream ticks goal writes; return the perf_counter time of each write.
+
+    Mirrors testv4.move_to_position's pacing, which needs lerobot to import.
+    """
+    times = np.empty(ticks)
+    goal = [2048] * len(MOTOR_IDS)
+    next_step = time.perf_counter()
+    for i in range(ticks):
+        goal[0] = 2048 + (i % 200)
+        bus.write_with_motor_ids(["sts3215"] * len(MOTOR_IDS), MOTOR_IDS, "Goal_Position", goal)
+        times[i] = time.perf_counter()
+        # Stand-in for the per-step work around the write (interpolation, status)
+        sum(range(2000))
+        if deadline_pacing:
+            next_step += PERIOD
+            time.sleep(max(next_step - time.perf_counter(), 0))
+        else:
+            time.sleep(PERIOD)
+    return times
+
+
+def run_case(load, workers, ticks, deadline_pacing):
+    bus = SimulatedMotorBus(MOTOR_IDS)
+    if load == "thread":
+        stop = threading.Event()
+        loaders = [threading.Thread(target=busy_work, args=(stop,), daemon=True) for _ in range(workers)]
+    elif load == "process":
+        stop = multiprocessing.Event()
+        loaders = [multiprocessing.Process(target=busy_work, args=(stop,), daemon=True) for _ in range(workers)]
+    else:
+        stop, loaders = None, []
+    for loader in loaders:
+        loader.start()
+    time.sleep(0.2)
+    try:
+        times = goal_loop(bus, ticks, deadline_pacing)
+    finally:
+        if stop is not None:
+            stop.set()
+        for loader in loaders:
+            loader.join()
+    period_error = np.abs(np.diff(times) - PERIOD) * 1000
+    drift = (times[-1] - times[0] - (ticks - 1) * PERIOD) * 1000
+    return period_error, drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark goal-stream jitter under load")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each case")
+    parser.add_argument("--workers", type=int, default=1, help="Load threads/processes")
+    args = parser.parse_args()
+    ticks = int(args.seconds / PERIOD)
+
+    print(f"{ticks} goal writes at {1 / PERIOD:.0f} Hz per case, {args.workers} load worker(s)")
+    print(f"{'load':<22}{'pacing':<10}{'p50 ms':>8}{'p99 ms':>8}{'max ms':>8}{'drift ms':>10}")
+    for load, label in [("none", "idle"), ("thread", "thread (same GIL)"), ("process", "separate process")]:
+        for deadline_pacing in (False, True):
+            error, drift = run_case(load, args.workers, ticks, deadline_pacing)
+            pacing = "deadline" if deadline_pacing else "sleep"
+            print(f"{label:<22}{pacing:<10}{np.percentile(error, 50):>8.2f}{np.percentile(error, 99):>8.2f}"
+                  f"{error.max():>8.2f}{drift:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
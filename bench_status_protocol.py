@@ -0,0 +1,121 @@
+"""Throughput benchmark: legacy JSON status messages vs the compact status protocol.
+
+Runs without a broker. Publishing goes to an in-memory client that counts
+messages and bytes, and every payload is decoded the way utils/mqtt_client
+does it, so the numbers cover both ends of the link.
+
+    python bench_status_protocol.py
+"""
+import io
+import json
+import logging
+import time
+from contextlib import redirect_stdout
+from utils.status_protocol import (StatusPublisher, decode_status, msgpack,
+                                   ENCODING_JSON, ENCODING_STRUCT, ENCODING_MSGPACK)
+
+NUM_MESSAGES = 20000
+STREAM_SECONDS = 1.0
+STREAM_RATE_HZ = 200  # progress updates per second per arm
+NUM_ARMS = 3
+
+logger = logging.getLogger("bench")
+logging.basicConfig(level=logging.WARNING)
+
+
+class CountingClient:
+    """Stands in for paho's client and decodes everything it is given"""
+
+    def __init__(self, decode):
+        self.decode = decode
+        self.messages = 0
+        self.bytes = 0
+        self.updates = 0
+
+    def publish(self, topic, payload, qos=0):
+        self.messages += 1
+        self.bytes += len(payload)
+        self.updates += len(self.decode(payload))
+
+
+def legacy_decode(payload):
+    # What on_message used to do for every message
+    text = payload.decode() if isinstance(payload, bytes) else payload
+    logger.info(f"Received message: {text}")
+    return [json.loads(text)]
+
+
+def legacy_publish(client, position_key, index, total):
+    progress = {
+        "status": "in_progress",
+        "position_key": position_key,
+        "position_index": index,
+        "total_positions": total,
+        "timestamp": time.time()
+    }
+    client.publish("smartreach/status", json.dumps(progress))
+    print(f"Published progress: {progress}")
+
+
+def bench_codec():
+    print(f"Encode + decode of {NUM_MESSAGES} progress updates (no batching)")
+    print(f"{'protocol':<12}{'us/msg':>10}{'bytes/msg':>12}")
+
+    client = CountingClient(legacy_decode)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for i in range(NUM_MESSAGES):
+            legacy_publish(client, 5, i % 8, 8)
+    elapsed = time.perf_counter() - start
+    print(f"{'legacy':<12}{elapsed / NUM_MESSAGES * 1e6:>10.2f}{client.bytes / NUM_MESSAGES:>12.1f}")
+
+    encodings = [ENCODING_JSON, ENCODING_STRUCT] + ([ENCODING_MSGPACK] if msgpack else [])
+    for encoding in encodings:
+        client = CountingClient(decode_status)
+        publisher = StatusPublisher(client, "smartreach/status", encoding=encoding, batch_interval=0)
+        start = time.perf_counter()
+        for i in range(NUM_MESSAGES):
+            publisher.publish("in_progress", position_key=5, position_index=i % 8, total_positions=8)
+        elapsed = time.perf_counter() - start
+        print(f"{encoding:<12}{elapsed / NUM_MESSAGES * 1e6:>10.2f}{client.bytes / NUM_MESSAGES:>12.1f}")
+
+
+def bench_stream(encoding, batch_interval):
+    clients = [CountingClient(decode_status) for _ in range(NUM_ARMS)]
+    publishers = [StatusPublisher(client, "smartreach/status", encoding=encoding, batch_interval=batch_interval)
+                  for client in clients]
+    period = 1.0 / STREAM_RATE_HZ
+    deadline = time.perf_counter()
+    end = deadline + STREAM_SECONDS
+    i = 0
+    while deadline < end:
+        for publisher in publishers:
+            publisher.publish("in_progress", position_key=5, position_index=i % 8, total_positions=8)
+        i += 1
+        deadline += period
+        time.sleep(max(deadline - time.perf_counter(), 0))
+    for publisher in publishers:
+        publisher.publish("completed", position_key=5)
+    messages = sum(client.messages for client in clients)
+    size = sum(client.bytes for client in clients)
+    updates = sum(client.updates for client in clients)
+    return messages, size, updates
+
+
+def main():
+    bench_codec()
+    print()
+    print(f"{NUM_ARMS} arms streaming progress at {STREAM_RATE_HZ} Hz for {STREAM_SECONDS:.0f}s")
+    print(f"{'protocol':<22}{'MQTT msgs':>10}{'bytes':>10}{'updates':>10}")
+    for label, encoding, interval in (
+        ("json, unbatched", ENCODING_JSON, 0),
+        ("json, 200 ms batches", ENCODING_JSON, 0.2),
+        ("struct, unbatched", ENCODING_STRUCT, 0),
+        ("struct, 200 ms batches", ENCODING_STRUCT, 0.2),
+    ):
+        messages, size, updates = bench_stream(encoding, interval)
+        print(f"{label:<22}{messages:>10}{size:>10}{updates:>10}")
+
+
+if __name__ == "__main__":
+    main()
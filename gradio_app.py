@@ -1,53 +1,191 @@
-import gradio as gr
 import random
 import time
+from utils.lazy_import import lazy_import
 from utils.gemini_api import process_image
-from utils.mqtt_client import start_mqtt_client, stop_mqtt_client, send_position_command, action_done_event
-
-def wait_for_action():
-    action_done_event.wait()
-    action_done_event.clear()
-
-def process_and_display(image, object_query):
-    if image is None:
-        return None, "No image captured."
-    
-    check_positions = [2, 4, 6]
-    pick_map = {2: 3, 4: 5, 6: 7}
+from utils.mqtt_client import start_mqtt_client, stop_mqtt_client, send_position_command, run_action
+from utils.frame_ring import read_shared_frame
+from utils.job_scheduler import JobScheduler, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED
+
+gr = lazy_import("gradio")
+
+STATUS_POLL_INTERVAL = 0.5
+# Stream at most a few frames per second, downscaled, so slow clients don't back up
+MIN_FRAME_INTERVAL = 0.25
+STREAM_MAX_WIDTH = 480
+# Set to a cv2 camera index to stream fresh frames from the arm camera at each position
+# (not needed when a camera process shares frames through the frame ring)
+CAMERA_INDEX = None
+CHECK_POSITIONS = [2, 4, 6]
+PICK_MAP = {2: 3, 4: 5, 6: 7}
+SHOW_POSITION = 8
+DROP_POSITION = 9
+HOME_POSITION = 1
+
+def move_to(position_key, job=None):
+    """Move the arm and wait for it; raises ActionFailed, which fails the job"""
+    def on_status(data):
+        if data.get("status") == "in_progress":
+            job.publish({
+                "stage": "motion",
+                "position_key": position_key,
+                "position_index": data.get("position_index"),
+                "total_positions": data.get("total_positions"),
+            })
+
+    if job is not None:
+        job.publish({"stage": "moving", "position_key": position_key})
+    run_action(lambda: send_position_command(position_key), position_key,
+               on_status=on_status if job is not None else None)
+
+def bgr_to_rgb(frame):
+    import cv2
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+def capture_frame(fallback):
+    # Frames from the camera process (smartreach_launcher.py) are BGR like cv2's;
+    # convert straight out of the shared slot instead of copying it first
+    frame = read_shared_frame(bgr_to_rgb)
+    if frame is not None:
+        return frame
+    if CAMERA_INDEX is None:
+        return fallback
+    import cv2
+    cap = cv2.VideoCapture(CAMERA_INDEX)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret:
+        return fallback
+    return bgr_to_rgb(frame)
+
+def prepare_frame(frame):
+    # Integer-stride downscale is a view, so no copy until Gradio encodes the JPEG
+    stride = -(-frame.shape[1] // STREAM_MAX_WIDTH)
+    return frame[::stride, ::stride] if stride > 1 else frame
+
+def run_find(job):
+    image = job.payload["image"]
     found = False
     decision_text = ""
-    
-    for pos in random.sample(check_positions, len(check_positions)):
-        send_position_command(pos)
-        wait_for_action()
-        prompt = f"Is there a {object_query} in frame? Answer yes or no."
+
+    for pos in random.sample(CHECK_POSITIONS, len(CHECK_POSITIONS)):
+        move_to(pos, job)
+        image = capture_frame(image)
+        job.publish({"stage": "analyzing", "position_key": pos, "frame": image})
+        prompt = f"Is there a {job.query} in frame? Answer yes or no."
         decision_text = process_image(image, prompt)
+        job.publish({"stage": "decision", "position_key": pos, "decision": decision_text})
         if decision_text == "yes":
-            send_position_command(pick_map[pos])
-            wait_for_action()
+            move_to(PICK_MAP[pos], job)
             found = True
             break
     if not found:
-        send_position_command(1)
-        wait_for_action()
-    
-    return image, decision_text
-
-iface = gr.Interface(
-    fn=process_and_display,
-    inputs=[
-        gr.Image(sources=["webcam"], type="numpy", label="Webcam Feed"),
-        gr.Textbox(label="Object Query", placeholder="Enter object, e.g., bottle")
-    ],
-    outputs=[
-        gr.Image(label="Output Image"),
-        gr.Textbox(label="Gemini Decision")
-    ],
-    title="SmartReach Gemini Integration",
-    description="Live webcam feed with Gemini decision processing and MQTT command publishing."
-)
+        move_to(HOME_POSITION, job)
+
+    return {"image": image, "decision": decision_text}
+
+def run_pick(job):
+    check_position = int(job.query)
+    if check_position not in PICK_MAP:
+        raise ValueError(f"Pick needs a check position ({', '.join(map(str, CHECK_POSITIONS))})")
+    move_to(PICK_MAP[check_position], job)
+    return {"image": job.payload.get("image"), "decision": f"picked at position {check_position}"}
+
+def run_show(job):
+    move_to(SHOW_POSITION, job)
+    return {"image": job.payload.get("image"), "decision": "shown"}
+
+def run_drop(job):
+    move_to(DROP_POSITION, job)
+    return {"image": job.payload.get("image"), "decision": "dropped"}
+
+# One arm on the MQTT bus, so all jobs share a single worker
+scheduler = JobScheduler({
+    "find": run_find,
+    "pick": run_pick,
+    "show": run_show,
+    "drop": run_drop,
+})
+
+def format_status(info):
+    if info["status"] == JOB_QUEUED:
+        return f"Job {info['job_id']} queued (#{info['queue_position']}, ETA {info['eta']:.0f}s)"
+    if info["status"] == JOB_RUNNING:
+        return f"Job {info['job_id']} running (ETA {info['eta']:.0f}s)"
+    if info["status"] == JOB_FAILED:
+        return f"Job {info['job_id']} failed: {info['error']}"
+    return f"Job {info['job_id']} done"
+
+def describe_update(update):
+    stage = update["stage"]
+    if stage == "moving":
+        return f"Moving to position {update['position_key']}"
+    if stage == "motion":
+        return (f"Position {update['position_key']}: waypoint "
+                f"{update['position_index'] + 1}/{update['total_positions']}")
+    if stage == "analyzing":
+        return f"Asking Gemini at position {update['position_key']}"
+    return f"Gemini at position {update['position_key']}: {update['decision']}"
+
+def process_and_display(image, object_query, action):
+    if action == "find" and image is None:
+        yield None, "No image captured.", ""
+        return
+
+    job = scheduler.submit(action, query=object_query, payload={"image": image})
+    seq = 0
+    pending_frame = None
+    last_frame_at = 0.0
+    decision_text = ""
+    progress_text = ""
+    while not job.done.is_set():
+        seq, updates = job.updates_since(seq, timeout=STATUS_POLL_INTERVAL)
+        for update in updates:
+            if "frame" in update:
+                pending_frame = update["frame"]
+            if update["stage"] == "decision":
+                decision_text = update["decision"]
+            progress_text = describe_update(update)
+
+        # Only the newest frame is kept; anything older than the throttle window is dropped
+        frame_out = gr.update()
+        if pending_frame is not None and time.monotonic() - last_frame_at >= MIN_FRAME_INTERVAL:
+            frame_out = prepare_frame(pending_frame)
+            pending_frame = None
+            last_frame_at = time.monotonic()
+
+        info = scheduler.status(job.job_id)
+        if info is None:
+            break
+        yield frame_out, decision_text, f"{format_status(info)}\n{progress_text}".strip()
+
+    status = format_status(job.to_dict())
+    if job.status != JOB_DONE:
+        yield gr.update(), decision_text, status
+        return
+    image = job.result["image"]
+    yield (prepare_frame(image) if image is not None else None), job.result["decision"], status
+
+def build_interface():
+    return gr.Interface(
+        fn=process_and_display,
+        inputs=[
+            gr.Image(sources=["webcam"], type="numpy", label="Webcam Feed"),
+            gr.Textbox(label="Object Query", placeholder="Enter object, e.g., bottle (or check position for pick)"),
+            gr.Radio(["find", "pick", "show", "drop"], value="find", label="Action")
+        ],
+        outputs=[
+            gr.Image(label="Output Image", format="jpeg"),
+            gr.Textbox(label="Gemini Decision"),
+            gr.Textbox(label="Job Status", lines=2)
+        ],
+        title="SmartReach Gemini Integration",
+        description="Live webcam feed with Gemini decision processing and MQTT command publishing. Frames, Gemini verdicts and motion progress stream in as the search runs."
+    )
 
 if __name__ == "__main__":
     start_mqtt_client()
-    iface.launch()
-    stop_mqtt_client()
\ No newline at end of file
+    scheduler.start()
+    iface = build_interface()
+    iface.queue(default_concurrency_limit=None).launch()
+    scheduler.stop(timeout=1)
+    stop_mqtt_client()
@@ -1,26 +1,62 @@
+import json
 import time
 import logging
-import cv2
 import random
-from utils.gemini_api import process_image, setup_gemini_api
-from utils.mqtt_client import start_mqtt_client, stop_mqtt_client, send_position_command, action_done_event
+from utils.lazy_import import lazy_import
+from utils.gemini_api import locate_object, detection_prompt, setup_gemini_api
+from utils.mqtt_client import (start_mqtt_client, stop_mqtt_client, send_position_command, send_positions_command,
+                               run_action, ActionFailed, get_joint_state)
+from utils.episode_recorder import EpisodeRecorder
+from utils.camera_calibration import load_calibration, detection_offset
+from utils.pick_planner import plan_pick
+from utils.frame_ring import read_shared_frame
+
+cv2 = lazy_import("cv2")
+
+SEQUENCES_FILE = "robot_sequences.json"
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def wait_for_action():
-    logger.info("Waiting for action to complete...")
-    action_done_event.wait()
+def wait_for_action(send, position_key):
+    """Send a command and wait for it; raises ActionFailed (or ActionStopped) if it doesn't complete"""
+    logger.info(f"Waiting for position {position_key} to complete...")
+    run_action(send, position_key)
     logger.info("Action completed.")
 
+def capture_frame():
+    # Use the camera process's shared frame ring when running under smartreach_launcher.py
+    frame = read_shared_frame()
+    if frame is not None:
+        return frame
+    cap = cv2.VideoCapture(0)
+    ret, frame = cap.read()
+    cap.release()
+    return frame if ret else None
+
+def load_sequences():
+    with open(SEQUENCES_FILE) as file:
+        return {sequence["key"]: sequence["positions"] for sequence in json.load(file)}
+
+def execute_pick(check_position, pick_key, detection, calibration, sequences):
+    """Run the pick for a detection, adjusted to the object's location when camera and IK are calibrated"""
+    offset = detection_offset(calibration, check_position, detection.center)
+    planned = None
+    if offset is not None and pick_key in sequences:
+        planned = plan_pick(sequences[pick_key], offset)
+    if planned is not None:
+        logger.info(f"Adjusting pick {pick_key} by {offset.round(1).tolist()} mm to the detected object")
+        wait_for_action(lambda: send_positions_command(planned, pick_key), pick_key)
+    else:
+        logger.info(f"Using recorded pick sequence {pick_key}")
+        wait_for_action(lambda: send_position_command(pick_key), pick_key)
+
 def main():
     setup_gemini_api()
     start_mqtt_client()
 
-    cap = cv2.VideoCapture(0)
-    ret, frame = cap.read()
-    cap.release()
-    if not ret:
+    frame = capture_frame()
+    if frame is None:
         logger.error("Failed to capture image")
         stop_mqtt_client()
         return
@@ -30,21 +66,55 @@ def main():
     pick_map = {2: 3, 4: 5, 6: 7}
     found = False
     decision_text = ""
+    recorder = EpisodeRecorder()
+    calibration = load_calibration()
+    sequences = load_sequences()
+    if not calibration:
+        logger.info("No camera calibration found; picks will use the recorded sequences")
     
-    for pos in random.sample(check_positions, len(check_positions)):
-        send_position_command(pos)
-        wait_for_action()
-        prompt = f"Is there a {object_query} in frame? Answer yes or no."
-        decision_text = process_image(frame, prompt)
-        logger.info(f"Gemini decision at check position {pos}: {decision_text}")
-        if decision_text == "yes":
-            send_position_command(pick_map[pos])
-            wait_for_action()
-            found = True
-            break
-    if not found:
-        send_position_command(1)
-        wait_for_action()
+    try:
+        for pos in random.sample(check_positions, len(check_positions)):
+            move_start = time.perf_counter()
+            wait_for_action(lambda: send_position_command(pos), pos)
+            move_latency = time.perf_counter() - move_start
+
+            # Capture at the check position so the frame matches the recorded pose
+            capture_start = time.perf_counter()
+            frame = capture_frame()
+            if frame is None:
+                logger.error(f"Failed to capture image at check position {pos}")
+                continue
+            capture_latency = time.perf_counter() - capture_start
+
+            prompt = detection_prompt(object_query)
+            gemini_start = time.perf_counter()
+            detection = locate_object(frame, object_query)
+            decision_text = detection.decision
+            gemini_latency = time.perf_counter() - gemini_start
+            logger.info(f"Gemini decision at check position {pos}: {decision_text}")
+            recorder.record(
+                frame,
+                sequence_key=pos,
+                joint_state=get_joint_state(),
+                prompt=prompt,
+                decision=decision_text,
+                latencies={"move": move_latency, "capture": capture_latency, "gemini": gemini_latency},
+                object_query=object_query,
+                box_2d=detection.box_2d,
+            )
+            if decision_text == "yes":
+                execute_pick(pos, pick_map[pos], detection, calibration, sequences)
+                found = True
+                break
+        if not found:
+            wait_for_action(lambda: send_position_command(1), 1)
+    except ActionFailed as e:
+        # Includes a stop from the controller's operator: leave the arm where it is
+        logger.error(f"Abandoning the search: {e}")
+    finally:
+        recorder.close()
+        if recorder.dropped:
+            logger.warning(f"{recorder.dropped} episode records were dropped")
     
     stop_mqtt_client()
 
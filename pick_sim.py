@@ -0,0 +1,138 @@
+"""Simulated check of vision-guided picking. No camera, Gemini or arm needed.
+
+Objects are placed at random spots around the recorded pick location and
+rendered into synthetic frames through a known camera model. A colour
+threshold stands in for Gemini's bounding box. The camera is calibrated
+from noisy marker observations, and both the recorded and the adjusted pick
+sequences run on a simulated motor bus. A pick succeeds when the gripper
+closes within GRASP_TOLERANCE_MM of the object.
+
+The grasp point is scored with IK's own forward kinematics, so the simulated
+arm matches the model exactly. This checks the detection-to-waypoint
+plumbing and the planner's limits. It says nothing about how accurate the
+model is on the real arm; bench_ik.py's table check covers that part. The
+simulation enables planning even though IK.CALIBRATED is off, and trials
+where plan_pick refuses count as recorded picks.
+
+    python pick_sim.py
+"""
+import json
+import time
+import numpy as np
+import IK
+from utils.camera_calibration import fit_homography, image_to_arm
+from utils.pick_planner import plan_pick, grasp_segment, grasp_point
+from utils.sim_arm import SimulatedMotorBus
+
+PICK_KEY = 5  # Pick sequence for check position 4
+TRIALS = 20
+PLACEMENT_RADIUS_MM = 60.0
+GRASP_TOLERANCE_MM = 15.0
+FRAME_SHAPE = (480, 640)
+OBJECT_SIZE_PX = 30
+MARKER_NOISE = 3.0  # normalized image units
+MOTOR_IDS = [1, 2, 3, 4, 5, 6]
+SEED = 1
+
+
+def make_camera(center_mm):
+    """Ground-truth homography from normalized image points to the table"""
+    scale = 0.3  # mm per normalized unit: a 300 mm field of view
+    angle = np.radians(8)
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]) * scale
+    H = np.eye(3)
+    H[:2, :2] = rotation
+    H[:2, 2] = center_mm - rotation @ [500, 500]
+    H[2, :2] = [2e-5, -1e-5]  # Mild perspective from the tilted camera
+    # Rescale the translation so the image center still lands on center_mm
+    H[:2, 2] += (np.array([500, 500]) @ H[2, :2]) * center_mm
+    return H
+
+
+def render(H_true, object_mm):
+    """Synthetic RGB frame with a red object drawn where the camera sees it"""
+    u, v = image_to_arm(np.linalg.inv(H_true), object_mm)
+    frame = np.full(FRAME_SHAPE + (3,), 90, dtype=np.uint8)
+    row = int(v / 1000 * FRAME_SHAPE[0])
+    col = int(u / 1000 * FRAME_SHAPE[1])
+    half = OBJECT_SIZE_PX // 2
+    frame[max(row - half, 0):row + half, max(col - half, 0):col + half] = (220, 30, 30)
+    return frame
+
+
+def detect(frame):
+    """Stand-in for Gemini: bounding box of red pixels as [ymin, xmin, ymax, xmax] in 0-1000"""
+    mask = (frame[..., 0] > 180) & (frame[..., 1] < 80)
+    if not mask.any():
+        return None
+    rows, cols = np.nonzero(mask)
+    return [int(rows.min() / FRAME_SHAPE[0] * 1000), int(cols.min() / FRAME_SHAPE[1] * 1000),
+            int(rows.max() / FRAME_SHAPE[0] * 1000), int(cols.max() / FRAME_SHAPE[1] * 1000)]
+
+
+def box_center(box):
+    ymin, xmin, ymax, xmax = box
+    return ((xmin + xmax) / 2, (ymin + ymax) / 2)
+
+
+def run_on_arm(positions, close_index):
+    """Drive the simulated arm through positions; return the grasp point when the gripper closes"""
+    bus = SimulatedMotorBus(MOTOR_IDS, initial_positions=positions[0])
+    bus.write_with_motor_ids(None, MOTOR_IDS, "Torque_Enable", [1] * len(MOTOR_IDS))
+    grasp = None
+    for i, position in enumerate(positions):
+        bus.write_with_motor_ids(None, MOTOR_IDS, "Goal_Position", position)
+        time.sleep(0.15)
+        if i == close_index:
+            present = bus.read_with_motor_ids(None, MOTOR_IDS, "Present_Position")
+            grasp = IK.forward_kinematics_ticks(present)[0, :2]
+    return grasp
+
+
+def main():
+    # The simulated arm is IK's own model, so it is calibrated by construction
+    IK.CALIBRATED = True
+    rng = np.random.default_rng(SEED)
+    with open("robot_sequences.json") as file:
+        sequences = {sequence["key"]: sequence["positions"] for sequence in json.load(file)}
+    recorded = sequences[PICK_KEY]
+    _, close_index = grasp_segment(recorded)
+    nominal = grasp_point(recorded)
+    H_true = make_camera(nominal)
+
+    # Calibrate from six marker placements observed with detection noise
+    markers_mm = nominal + rng.uniform(-100, 100, (6, 2))
+    markers_px = image_to_arm(np.linalg.inv(H_true), markers_mm) + rng.normal(0, MARKER_NOISE, (6, 2))
+    H = fit_homography(markers_px, markers_mm)
+    reference = image_to_arm(np.linalg.inv(H), nominal)
+
+    results = {"recorded": [], "adjusted": []}
+    fallbacks = 0
+    for trial in range(TRIALS):
+        radius = PLACEMENT_RADIUS_MM * np.sqrt(rng.uniform())
+        angle = rng.uniform(0, 2 * np.pi)
+        object_mm = nominal + radius * np.array([np.cos(angle), np.sin(angle)])
+
+        box = detect(render(H_true, object_mm))
+        offset = image_to_arm(H, box_center(box)) - image_to_arm(H, reference)
+        planned = plan_pick(recorded, offset)
+        if planned is None:
+            fallbacks += 1
+            planned = recorded
+
+        for label, positions in (("recorded", recorded), ("adjusted", planned)):
+            grasp = run_on_arm(positions, close_index)
+            results[label].append(np.linalg.norm(grasp - object_mm))
+        print(f"trial {trial + 1:2d}: object {radius:5.1f} mm off, grasp miss "
+              f"recorded {results['recorded'][-1]:5.1f} mm, adjusted {results['adjusted'][-1]:5.1f} mm")
+
+    print()
+    for label, misses in results.items():
+        misses = np.array(misses)
+        print(f"{label:<9} first-attempt picks {np.mean(misses < GRASP_TOLERANCE_MM) * 100:5.1f}%  "
+              f"median miss {np.median(misses):5.1f} mm")
+    print(f"adjusted picks that fell back to the recorded sequence: {fallbacks}/{TRIALS}")
+
+
+if __name__ == "__main__":
+    main()
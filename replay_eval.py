@@ -0,0 +1,332 @@
+"""Offline replay of labeled frames through the Gemini yes/no decision path.
+
+Runs every frame through each configuration (model x prompt x image width)
+on a thread pool and reports accuracy, p50/p95 latency, image bytes, tokens
+and the GeminiDecision validation-failure rate per configuration. Invalid
+replies count as "no", as they do in process_image. With --min-accuracy it
+names the fastest configuration that meets the bar.
+
+Frames can come from:
+
+    a directory or .zip/.tar(.gz) laid out as <object>/<yes|no>/<frame>.jpg
+    a directory or archive with labels.jsonl lines
+        {"image": "frames/001.jpg", "query": "red cup", "label": "yes"}
+    an episode directory from utils/episode_recorder.py; records need a
+        "label" field. --use-recorded-decisions scores unlabeled records
+        against the decision recorded live, which came from the
+        locate_object prompt, so it measures agreement, not accuracy.
+
+The "fake" backend answers locally with simulated latency and errors, to
+check the harness and the dataset without spending API quota.
+
+    python replay_eval.py episodes --backend fake
+    python replay_eval.py frames.zip --models models/gemini-2.0-flash models/gemini-2.0-flash-lite \\
+        --max-widths 0 640 320 --rpm 30 --min-accuracy 0.95 --json results.json
+"""
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import random
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from utils.gemini_api import MODEL_NAME, generate_decision, parse_decision
+from utils.episode_recorder import EpisodeReader
+
+DEFAULT_PROMPT = "Is there a {object} in frame? Answer yes or no."
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+LABELS_FILE = "labels.jsonl"
+JPEG_QUALITY = 90
+DEFAULT_WORKERS = 8
+DEFAULT_RPM = 60  # requests per minute for the gemini backend
+
+
+def _label(value):
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    return str(value).strip().lower()
+
+
+def _samples_from_files(files):
+    """files maps relative path -> bytes; returns samples from labels.jsonl or the folder layout"""
+    samples = []
+    if LABELS_FILE in files:
+        for line in files[LABELS_FILE].decode().splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                samples.append({"id": entry["image"], "query": entry["query"],
+                                "label": _label(entry["label"]), "image": files[entry["image"]]})
+        return samples
+    for path in sorted(files):
+        parts = path.split("/")
+        if len(parts) >= 3 and parts[-2] in ("yes", "no") and path.lower().endswith(IMAGE_EXTENSIONS):
+            samples.append({"id": path, "query": parts[-3].replace("_", " "),
+                            "label": parts[-2], "image": files[path]})
+    return samples
+
+
+def _wanted(name):
+    """Only frames and the labels manifest are read; anything else in the tree is skipped"""
+    return name == LABELS_FILE or name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def load_samples(path, use_recorded_decisions=False):
+    """Load labeled frames from a directory, archive or episode directory"""
+    if os.path.isdir(path) and glob.glob(os.path.join(path, "chunk_*.idx")):
+        reader = EpisodeReader(path)
+        samples = []
+        unlabeled = 0
+        for i, record in enumerate(reader):
+            label = record.get("label")
+            if label is None and use_recorded_decisions:
+                label = record.get("decision")
+            if label is None:
+                unlabeled += 1
+                continue
+            if record.get("object_query"):
+                samples.append({"id": f"{record['chunk']}:{i}", "query": record["object_query"],
+                                "label": _label(label), "image": record["jpeg"]})
+        reader.close()
+        if unlabeled:
+            print(f"Skipped {unlabeled} unlabeled episode records (see --use-recorded-decisions)")
+        return samples
+    files = {}
+    if os.path.isdir(path):
+        for root, _, names in os.walk(path):
+            for name in names:
+                full = os.path.join(root, name)
+                relative = os.path.relpath(full, path).replace(os.sep, "/")
+                if _wanted(relative):
+                    with open(full, "rb") as file:
+                        files[relative] = file.read()
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            files = {os.path.normpath(name): archive.read(name) for name in archive.namelist()
+                     if not name.endswith("/") and _wanted(os.path.normpath(name))}
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            files = {os.path.normpath(member.name): archive.extractfile(member).read()
+                     for member in archive.getmembers() if member.isfile() and _wanted(os.path.normpath(member.name))}
+    else:
+        raise ValueError(f"{path} is not a directory, episode directory or archive")
+    return _samples_from_files(files)
+
+
+def prepare_image(data, max_width):
+    """Decode, downscale to max_width (0 keeps the size) and re-encode as JPEG"""
+    from PIL import Image
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    if max_width and image.width > max_width:
+        image = image.resize((max_width, round(image.height * max_width / image.width)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than rpm start per minute (0 = unlimited)"""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._next = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.perf_counter()
+            start = max(self._next, now)
+            self._next = start + self.interval
+        time.sleep(max(start - now, 0))
+
+
+def gemini_backend(sample, jpeg, prompt, model):
+    """Return (reply text, prompt tokens, output tokens) from the real API"""
+    from PIL import Image
+    response = generate_decision(Image.open(io.BytesIO(jpeg)), prompt, model)
+    usage = getattr(response, "usage_metadata", None)
+    return (response.text, getattr(usage, "prompt_token_count", None),
+            getattr(usage, "candidates_token_count", None))
+
+
+class FakeBackend:
+    """Local stand-in: right with probability accuracy (worse below 320 px wide),
+    invalid replies at invalid_rate, latency growing with image bytes"""
+
+    def __init__(self, accuracy=0.95, invalid_rate=0.02, base_latency=0.25, latency_per_kb=0.002, seed=0):
+        self.accuracy = accuracy
+        self.invalid_rate = invalid_rate
+        self.base_latency = base_latency
+        self.latency_per_kb = latency_per_kb
+        self.seed = seed
+
+    def __call__(self, sample, jpeg, prompt, model):
+        from PIL import Image
+        width = Image.open(io.BytesIO(jpeg)).width
+        key = f"{self.seed}|{sample['id']}|{prompt}|{model}|{width}".encode()
+        rng = random.Random(hashlib.sha1(key).hexdigest())
+        time.sleep(self.base_latency + self.latency_per_kb * len(jpeg) / 1024 + rng.uniform(0, 0.05))
+        error_rate = 1 - self.accuracy + max(0, 320 - width) / 320 * 0.3
+        if rng.random() < self.invalid_rate:
+            text = "I cannot tell."
+        elif rng.random() < error_rate:
+            text = "no" if sample["label"] == "yes" else "yes"
+        else:
+            text = sample["label"]
+        return text, 258 + len(prompt) // 4, 1
+
+
+def evaluate(samples, configs, backend, workers=DEFAULT_WORKERS, rpm=0):
+    """Run every sample through every config; return one result dict per call"""
+    limiter = RateLimiter(rpm)
+    images = {}
+    for config in configs:
+        for sample in samples:
+            key = (sample["id"], config["max_width"])
+            if key not in images:
+                images[key] = prepare_image(sample["image"], config["max_width"])
+
+    def run(config, sample):
+        jpeg = images[(sample["id"], config["max_width"])]
+        prompt = config["prompt"].format(object=sample["query"])
+        result = {"config": config["name"], "id": sample["id"], "label": sample["label"],
+                  "bytes": len(jpeg), "valid": False, "decision": None, "error": None,
+                  "prompt_tokens": None, "output_tokens": None}
+        limiter.wait()
+        start = time.perf_counter()
+        try:
+            text, result["prompt_tokens"], result["output_tokens"] = backend(sample, jpeg, prompt, config["model"])
+        except Exception as e:
+            result["error"] = str(e)
+            result["latency"] = time.perf_counter() - start
+            return result
+        result["latency"] = time.perf_counter() - start
+        try:
+            result["decision"] = parse_decision(text)
+            result["valid"] = True
+        except ValueError:
+            # pydantic.ValidationError is a ValueError; process_image treats these as "no"
+            result["decision"] = "no"
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run, config, sample) for config in configs for sample in samples]
+        return [future.result() for future in futures]
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)] if values else float("nan")
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def summarize(results, configs):
+    """Per-config metrics, in config order"""
+    summary = []
+    for config in configs:
+        rows = [row for row in results if row["config"] == config["name"]]
+        answered = [row for row in rows if row["error"] is None]
+        latencies = [row["latency"] for row in answered]
+        summary.append({
+            "config": config["name"],
+            "n": len(rows),
+            "errors": len(rows) - len(answered),
+            "accuracy": _mean([row["decision"] == row["label"] for row in answered]),
+            "invalid_rate": _mean([not row["valid"] for row in answered]),
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "kb": _mean([row["bytes"] / 1024 for row in rows]),
+            "prompt_tokens": _mean([row["prompt_tokens"] for row in answered]),
+            "output_tokens": _mean([row["output_tokens"] for row in answered]),
+        })
+    return summary
+
+
+def fastest_meeting(summary, min_accuracy):
+    """The config with the lowest p50 latency whose accuracy reaches min_accuracy, or None"""
+    eligible = [row for row in summary if row["accuracy"] is not None and row["accuracy"] >= min_accuracy]
+    return min(eligible, key=lambda row: (row["p50"], row["p95"]), default=None)
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay labeled frames through the Gemini decision path")
+    parser.add_argument("source", help="Frame directory, .zip/.tar archive or episode directory")
+    parser.add_argument("--models", nargs="+", default=[MODEL_NAME])
+    parser.add_argument("--prompts", nargs="+", default=[DEFAULT_PROMPT],
+                        help="Prompt templates; {object} is replaced with the query")
+    parser.add_argument("--max-widths", nargs="+", type=int, default=[0], help="0 keeps the original size")
+    parser.add_argument("--backend", choices=["gemini", "fake"], default="gemini")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--rpm", type=float, default=None,
+                        help=f"Request rate limit per minute (default {DEFAULT_RPM} for gemini, none for fake)")
+    parser.add_argument("--limit", type=int, help="Use at most this many frames")
+    parser.add_argument("--min-accuracy", type=float, help="Report the fastest config meeting this accuracy")
+    parser.add_argument("--json", help="Write per-frame results and the summary to this file")
+    parser.add_argument("--use-recorded-decisions", action="store_true",
+                        help="Score unlabeled episode records against their recorded live decision")
+    args = parser.parse_args()
+
+    if args.use_recorded_decisions:
+        print("Using recorded decisions as labels for unlabeled episode records: "
+              "accuracy on those measures agreement with the live locate_object path, not correctness")
+    samples = load_samples(args.source, args.use_recorded_decisions)[:args.limit]
+    if not samples:
+        print(f"No labeled frames found in {args.source}")
+        return
+    configs = []
+    for model in args.models:
+        for p, prompt in enumerate(args.prompts):
+            for width in args.max_widths:
+                name = f"{model.split('/')[-1]} p{p} {'full' if not width else f'{width}px'}"
+                configs.append({"name": name, "model": model, "prompt": prompt, "max_width": width})
+    backend = gemini_backend if args.backend == "gemini" else FakeBackend()
+    rpm = args.rpm if args.rpm is not None else (DEFAULT_RPM if args.backend == "gemini" else 0)
+
+    labels = [sample["label"] for sample in samples]
+    print(f"{len(samples)} frames ({labels.count('yes')} yes, {labels.count('no')} no), "
+          f"{len(configs)} configs, {args.backend} backend")
+    for p, prompt in enumerate(args.prompts):
+        print(f"  p{p}: {prompt}")
+    start = time.perf_counter()
+    results = evaluate(samples, configs, backend, workers=args.workers, rpm=rpm)
+    print(f"{len(results)} calls in {time.perf_counter() - start:.1f} s")
+    print()
+
+    summary = summarize(results, configs)
+    width = max(len(row["config"]) for row in summary) + 2
+    print(f"{'config':<{width}}{'acc':>7}{'invalid':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'KB':>8}{'in tok':>8}{'out tok':>8}")
+    for row in summary:
+        print(f"{row['config']:<{width}}{_fmt(row['accuracy'], '>7.1%')}{_fmt(row['invalid_rate'], '>9.1%')}"
+              f"{row['errors']:>8}{row['p50'] * 1000:>9.0f}{row['p95'] * 1000:>9.0f}{row['kb']:>8.1f}"
+              f"{_fmt(row['prompt_tokens'], '>8.0f')}{_fmt(row['output_tokens'], '>8.1f')}")
+
+    if args.min_accuracy is not None:
+        best = fastest_meeting(summary, args.min_accuracy)
+        print()
+        if best:
+            print(f"Fastest config with accuracy >= {args.min_accuracy:.0%}: {best['config']}")
+        else:
+            print(f"No config reached accuracy {args.min_accuracy:.0%}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"configs": configs, "summary": summary, "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
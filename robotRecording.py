@@ -1,10 +1,9 @@
 import json
 import os
 import sys
-import time
 import tty
 import termios
-import select
+from utils.event_loop import EventLoop
 
 # === Dummy Classes for Testing (replace these with actual imports if available) ===
 class FeetechMotorsBusConfig:
@@ -35,25 +34,10 @@ MOTOR_MODEL = "sts3215"
 MOTOR_MODELS = [MOTOR_MODEL] * len(MOTOR_IDS)
 BAUDRATE = 1_000_000
 JSON_FILE = "robot_sequences.json"
+DISPLAY_INTERVAL = 0.1  # How often the live position readout refreshes (seconds)
 
 # === Helper Functions ===
 
-def getch():
-    """Get a single character from standard input."""
-    fd = sys.stdin.fileno()
-    old_settings = termios.tcgetattr(fd)
-    try:
-        tty.setraw(sys.stdin.fileno())
-        ch = sys.stdin.read(1)
-    finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-    return ch
-
-def kbhit():
-    """Check if a keypress is available."""
-    dr, dw, de = select.select([sys.stdin], [], [], 0)
-    return dr != []
-
 def get_position(motor_bus):
     """Get current positions of all motors."""
     return motor_bus.read_with_motor_ids(
@@ -125,45 +109,59 @@ def record_sequence(motor_bus):
     print("Press 'q' to quit without saving")
     print("Current position values will update continuously below:")
     
-    recording = True
+    result = {"key": None, "positions": None, "error": None}
+    loop = EventLoop()
+
+    def show_position():
+        try:
+            current_position = get_position(motor_bus)
+        except Exception as e:
+            result["error"] = e
+            loop.stop()
+            return
+        position_str = ', '.join([f"{pos:4d}" for pos in current_position])
+        sys.stdout.write("\r" + " " * 80)  # Clear the line
+        sys.stdout.write(f"\rCurrent position: [{position_str}]")
+        sys.stdout.flush()
+
+    def on_key():
+        # Keys are handled as soon as they arrive instead of at the next refresh
+        for key in os.read(fd, 64).decode(errors="ignore"):
+            if key == 'a':
+                current_position = get_position(motor_bus)
+                positions.append(current_position)
+                sys.stdout.write("\n" + " " * 80)
+                sys.stdout.write(f"\nPosition {len(positions)} recorded: {current_position}\n")
+                sys.stdout.flush()
+            elif key == 's':
+                if positions:
+                    result["key"], result["positions"] = sequence_key, positions
+                    loop.stop()
+                    return
+                sys.stdout.write("\n" + " " * 80)
+                sys.stdout.write("\nNo positions recorded, nothing to save.\n")
+                sys.stdout.flush()
+            elif key == 'q':
+                loop.stop()
+                return
+
     try:
         tty.setraw(fd)
-        while recording:
-            current_position = get_position(motor_bus)
-            position_str = ', '.join([f"{pos:4d}" for pos in current_position])
-            
-            sys.stdout.write("\r" + " " * 80)  # Clear the line
-            sys.stdout.write(f"\rCurrent position: [{position_str}]")
-            sys.stdout.flush()
-            
-            if kbhit():
-                key = sys.stdin.read(1)
-                if key == 'a':
-                    positions.append(current_position)
-                    sys.stdout.write("\n" + " " * 80)
-                    sys.stdout.write(f"\nPosition {len(positions)} recorded: {current_position}\n")
-                    sys.stdout.flush()
-                elif key == 's':
-                    if positions:
-                        recording = False
-                        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-                        print("\nSaving sequence...")
-                        return sequence_key, positions
-                    else:
-                        sys.stdout.write("\n" + " " * 80)
-                        sys.stdout.write("\nNo positions recorded, nothing to save.\n")
-                        sys.stdout.flush()
-                elif key == 'q':
-                    recording = False
-                    termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-                    print("\nExiting without saving...")
-                    return None, None
-            time.sleep(0.1)
-    except Exception as e:
-        print(f"\nError during recording: {e}")
+        loop.add_reader(fd, on_key)
+        loop.call_every(DISPLAY_INTERVAL, show_position)
+        show_position()
+        loop.run()
     finally:
         termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-    return None, None
+        loop.close()
+    if result["error"] is not None:
+        print(f"\nError during recording: {result['error']}")
+        return None, None
+    if result["key"] is None:
+        print("\nExiting without saving...")
+    else:
+        print("\nSaving sequence...")
+    return result["key"], result["positions"]
 
 # === Primary Functionality ===
 
@@ -262,6 +260,8 @@ def main():
                 sequence_index = find_sequence_by_key(sequences, sequence_key)
                 if sequence_index >= 0:
                     sequences[sequence_index]["positions"] = positions
+                    # Speed profiles tuned for the old positions no longer apply
+                    sequences[sequence_index].pop("profiles", None)
                     print(f"Updated sequence {sequence_key} with {len(positions)} positions")
                 else:
                     sequences.append({
@@ -0,0 +1,103 @@
+"""Run SmartReach as separate processes so motion timing doesn't share the GIL.
+
+    motion     testv4.py, the 20 Hz goal-position stream and MQTT command handling,
+               pinned to its own CPU when the machine has more than one
+    camera     utils.frame_ring.run_camera, capturing into a shared-memory ring
+    inference  gradio_app.py (default) or main.py, reading frames from the ring
+               (SMARTREACH_FRAME_RING) instead of opening the camera per capture
+
+Motion and inference still talk over MQTT. The camera reports readiness on
+a Pipe (see utils/frame_ring.py). Ctrl-C stops everything.
+
+    python smartreach_launcher.py
+    python smartreach_launcher.py --ui main --camera 1
+    python smartreach_launcher.py --no-motion    # controller runs on another machine
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from utils.frame_ring import run_camera, RING_ENV, CAMERA_FPS
+
+CAMERA_START_TIMEOUT = 10.0
+
+
+def pin_processes(motion_pid, other_pids):
+    """Give the motion process a CPU of its own and keep everything else off it"""
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < 2:
+        return
+    motion_cpu, rest = cpus[-1], set(cpus[:-1])
+    os.sched_setaffinity(motion_pid, {motion_cpu})
+    for pid in other_pids + [os.getpid()]:
+        os.sched_setaffinity(pid, rest)
+    print(f"Motion process pinned to CPU {motion_cpu}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Launch SmartReach as separate processes")
+    parser.add_argument("--ui", choices=["gradio_app", "main", "none"], default="gradio_app")
+    parser.add_argument("--camera", type=int, default=0, help="cv2 camera index")
+    parser.add_argument("--fps", type=float, default=CAMERA_FPS)
+    parser.add_argument("--no-motion", action="store_true", help="Don't start testv4.py here")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    conn, child_conn = ctx.Pipe()
+    camera = ctx.Process(target=run_camera, args=(child_conn, args.camera, args.fps), name="camera", daemon=True)
+    camera.start()
+    if not conn.poll(CAMERA_START_TIMEOUT):
+        print("Camera process did not start in time")
+        camera.terminate()
+        return
+    message = conn.recv()
+    if message[0] != "ready":
+        print(f"Camera process failed: {message[1]}")
+        return
+    _, ring_name, shape = message
+    print(f"Camera streaming {shape[1]}x{shape[0]} frames into shared memory ring {ring_name}")
+
+    env = dict(os.environ, **{RING_ENV: ring_name})
+    children = []
+    motion = None
+    if not args.no_motion:
+        # With main.py on the terminal, the controller runs headless
+        stdin = subprocess.DEVNULL if args.ui == "main" else None
+        motion = subprocess.Popen([sys.executable, "testv4.py"], env=env, stdin=stdin)
+        children.append(motion)
+    if args.ui != "none":
+        stdin = None if args.ui == "main" else subprocess.DEVNULL
+        children.append(subprocess.Popen([sys.executable, f"{args.ui}.py"], env=env, stdin=stdin))
+    if motion is not None:
+        pin_processes(motion.pid, [camera.pid] + [child.pid for child in children if child is not motion])
+
+    interrupted = False
+    try:
+        while camera.is_alive() and all(child.poll() is None for child in children):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        # The terminal already sent SIGINT to every child in our process group
+        interrupted = True
+    finally:
+        print("Stopping SmartReach processes...")
+        for child in children:
+            if child.poll() is None and not interrupted:
+                # SIGINT lets testv4 publish shutdown, disable torque and close the bus
+                child.send_signal(signal.SIGINT)
+        for child in children:
+            try:
+                child.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                child.kill()
+        if camera.is_alive():
+            conn.send(("stop",))
+            camera.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
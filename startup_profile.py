@@ -0,0 +1,68 @@
+"""Import-time breakdown of the SmartReach entry points.
+
+Imports each entry point in a fresh interpreter with `python -X importtime`
+and reports the total, plus the entry point's direct imports that account
+for most of it. Modules loaded through utils.lazy_import don't appear until
+first used, which is the point.
+
+    python startup_profile.py                 # all entry points
+    python startup_profile.py testv4 --top 5
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = ["main", "gradio_app", "testv4", "robotRecording"]
+
+
+def profile_import(module):
+    """Return (wall seconds, import seconds, {direct import: cumulative seconds}, error or None)"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    imports = {}
+    children = {}
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        # importtime lists children before their parent, so collect the
+        # direct imports until the entry module's own line closes them
+        if depth == 1:
+            children[name] = int(cumulative) / 1e6
+        elif depth == 0:
+            if name == module:
+                imports = children
+                total = int(cumulative) / 1e6
+            children = {}
+    error = None
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1]
+    return wall, total, imports, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time of the entry points")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--top", type=int, default=8, help="Imports to list per entry point")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        wall, total, imports, error = profile_import(module)
+        print(f"{module}: {total * 1000:.0f} ms import, {wall * 1000:.0f} ms wall including interpreter start")
+        if error:
+            print(f"  import failed: {error}")
+        for name, seconds in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {seconds * 1000:8.1f} ms  {name}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
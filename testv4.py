@@ -1,14 +1,23 @@
 import json
+import os
+import queue
+import signal
 import time
 import sys
 import tty
 import termios
-import select
-import paho.mqtt.client as mqtt
-from threading import Thread
+from threading import Thread, Lock, Event
+from utils.event_loop import EventLoop, attach_mqtt
+from utils.lazy_import import lazy_import
+from utils.status_protocol import StatusPublisher, ENCODING_JSON
+from utils.telemetry import TelemetryLog, TelemetrySampler
+from utils.motion_tuning import DEFAULT_PROFILE, MAX_ACCELERATION, profile_for
 from lerobot.common.robot_devices.motors.configs import FeetechMotorsBusConfig
 from lerobot.common.robot_devices.motors.feetech import FeetechMotorsBus
 
+mqtt = lazy_import("paho.mqtt.client")
+IK = lazy_import("IK")  # Joint limits for planned positions; loads numpy on first use
+
 ##sudo chmod 666 /dev/ttyACM1
 ## ls /dev/ttyACM*
 
@@ -19,11 +28,23 @@ MOTOR_IDS = [1, 2, 3, 4, 5, 6]
 MOTOR_MODEL = "sts3215"
 MOTOR_MODELS = [MOTOR_MODEL] * len(MOTOR_IDS)
 BAUDRATE = 1_000_000
+MAX_TICK = 4095  # Full range of motors without IK joint limits (wrist roll, gripper)
 
 # Lower acceleration for smoother movement
 PID_P, PID_I, PID_D = 5, 1, 0
 ACCELERATION = 15
 
+# Register values written at startup, in write order
+MOTOR_CONFIG = (
+    ("Mode", 0),
+    ("P_Coefficient", PID_P),
+    ("I_Coefficient", PID_I),
+    ("D_Coefficient", PID_D),
+    # High enough for the fastest tuned profile; untuned moves still use ACCELERATION
+    ("Maximum_Acceleration", MAX_ACCELERATION),
+    ("Acceleration", ACCELERATION),
+)
+
 # JSON file with saved positions
 JSON_FILE = "robot_sequences.json"
 
@@ -32,6 +53,38 @@ MQTT_BROKER = "localhost"  # Change this to your MQTT broker address
 MQTT_PORT = 1883
 MQTT_COMMAND_TOPIC = "smartreach/command"
 MQTT_STATUS_TOPIC = "smartreach/status"  # New topic for status updates
+STATUS_ENCODING = ENCODING_JSON  # "struct" or "msgpack" for compact binary status
+STATUS_BATCH_INTERVAL = 0.2  # Coalesce progress updates arriving faster than this (seconds)
+VERBOSE_STATUS = False  # Print every published progress update
+MQTT_MISC_INTERVAL = 5.0  # Keepalive/reconnect check interval (seconds); the keepalive is 60 s
+
+# Keyboard control: digits run sequences, space stops the arm where it is
+QUIT_KEYS = ('q', 'Q', '\x1b')  # q, Q or ESC
+STOP_KEYS = (' ',)
+
+# Joint telemetry sampling (see utils/telemetry.py for the log format and query tool)
+TELEMETRY_ENABLED = True
+TELEMETRY_DIR = "telemetry"
+
+status_publisher = None
+telemetry_sampler = None
+
+# The telemetry thread shares the serial bus with the command threads
+bus_lock = Lock()
+last_goal = None
+current_acceleration = None
+
+# Commands run one at a time on the motion thread; the event loop only queues them.
+# Each queued command carries the stop generation it was queued under; a stop
+# bumps the generation, so commands queued or running before it can't run on.
+command_queue = queue.Queue()
+stop_generation = 0
+running_generation = 0
+abort_motion = Event()  # Wakes the motion thread's waits when a stop arrives
+
+
+class MotionAborted(Exception):
+    """Raised inside a running sequence when a stop command arrives"""
 
 
 def load_position_sequences():
@@ -54,38 +107,155 @@ def get_sequence_by_key(sequences, key):
     return None
 
 
+def get_profiles_by_key(sequences, key, start=None):
+    """Get the tuned per-segment speed profiles of a sequence (see tune_motion.py), or None.
+
+    start is where the arm is now. The first segment falls back to the
+    default profile if it is a longer move than the one it was tuned on.
+    """
+    for sequence in sequences:
+        if sequence["key"] == key and "profiles" in sequence:
+            profiles = [profile_for(sequence, i, start=start if i == 0 else None)
+                        for i in range(len(sequence["positions"]))]
+            if profiles[0] is DEFAULT_PROFILE and profile_for(sequence, 0) is not DEFAULT_PROFILE:
+                print(f"Sequence {key} starts farther away than it was tuned from; first move at default speed")
+            return profiles
+    return None
+
+
+def check_positions(positions):
+    """Raise ValueError unless positions is a list of integer tick lists within the joint limits"""
+    if not isinstance(positions, list) or not positions:
+        raise ValueError("positions must be a non-empty list")
+    for index, position in enumerate(positions):
+        if not isinstance(position, list) or len(position) != len(MOTOR_IDS):
+            raise ValueError(f"Position {index} needs {len(MOTOR_IDS)} values")
+        for joint, value in enumerate(position):
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError(f"Position {index}, motor {MOTOR_IDS[joint]}: {value!r} is not an integer")
+            if joint < IK.ARM_JOINTS:
+                low, high = int(IK.JOINT_MIN_TICKS[joint]), int(IK.JOINT_MAX_TICKS[joint])
+            else:
+                low, high = 0, MAX_TICK
+            if not low <= value <= high:
+                raise ValueError(f"Position {index}, motor {MOTOR_IDS[joint]}: {value} is outside {low}-{high}")
+
+
 def set_torque(motor_bus, enable=False):
     """Enable or disable torque for all motors"""
     value = 1 if enable else 0
-    motor_bus.write_with_motor_ids(
-        motor_models=MOTOR_MODELS,
-        motor_ids=MOTOR_IDS,
-        data_name="Torque_Enable",
-        values=[value] * len(MOTOR_IDS),
-    )
+    with bus_lock:
+        motor_bus.write_with_motor_ids(
+            motor_models=MOTOR_MODELS,
+            motor_ids=MOTOR_IDS,
+            data_name="Torque_Enable",
+            values=[value] * len(MOTOR_IDS),
+        )
 
 
 def set_goal(motor_bus, position):
     """Set goal position for all motors"""
-    motor_bus.write_with_motor_ids(
-        motor_models=MOTOR_MODELS,
-        motor_ids=MOTOR_IDS,
-        data_name="Goal_Position",
-        values=position,
-    )
+    global last_goal
+    with bus_lock:
+        motor_bus.write_with_motor_ids(
+            motor_models=MOTOR_MODELS,
+            motor_ids=MOTOR_IDS,
+            data_name="Goal_Position",
+            values=position,
+        )
+    last_goal = list(position)
+
+
+def set_acceleration(motor_bus, acceleration):
+    """Set the Acceleration register of all motors, skipping the write if unchanged"""
+    global current_acceleration
+    if acceleration == current_acceleration:
+        return
+    with bus_lock:
+        motor_bus.write_with_motor_ids(
+            motor_models=MOTOR_MODELS,
+            motor_ids=MOTOR_IDS,
+            data_name="Acceleration",
+            values=[acceleration] * len(MOTOR_IDS),
+        )
+    current_acceleration = acceleration
 
 
 def get_current_positions(motor_bus):
-    """Get current positions of all motors"""
-    current_positions = []
-    for motor_id in MOTOR_IDS:
-        current_position = motor_bus.read_with_motor_ids(
-            motor_models=[MOTOR_MODEL],
-            motor_ids=[motor_id],
+    """Get current positions of all motors in a single sync read"""
+    with bus_lock:
+        current_positions = motor_bus.read_with_motor_ids(
+            motor_models=MOTOR_MODELS,
+            motor_ids=MOTOR_IDS,
             data_name="Present_Position",
-        )[0]
-        current_positions.append(current_position)
-    return current_positions
+        )
+    return [int(position) for position in current_positions]
+
+
+def motor_config_matches(motor_bus):
+    """Check with one sync read per register whether all servos already hold MOTOR_CONFIG"""
+    for field, value in MOTOR_CONFIG:
+        with bus_lock:
+            current = motor_bus.read_with_motor_ids(
+                motor_models=MOTOR_MODELS,
+                motor_ids=MOTOR_IDS,
+                data_name=field,
+            )
+        if any(int(reading) != value for reading in current):
+            return False
+    return True
+
+
+def configure_motors(motor_bus):
+    """Write MOTOR_CONFIG and enable torque, skipping the writes if already configured"""
+    global current_acceleration
+    try:
+        configured = motor_config_matches(motor_bus)
+    except Exception as e:
+        print(f"Could not read motor configuration ({e}), rewriting it")
+        configured = False
+
+    if configured:
+        # Also avoids dropping torque, so a restarted controller doesn't let the arm sag
+        print("Motors already configured, skipping configuration writes")
+    else:
+        # Disable torque to configure motors
+        set_torque(motor_bus, enable=False)
+
+        # Configure motors for smooth movement
+        for field, value in MOTOR_CONFIG:
+            with bus_lock:
+                motor_bus.write_with_motor_ids(
+                    motor_models=MOTOR_MODELS,
+                    motor_ids=MOTOR_IDS,
+                    data_name=field,
+                    values=[value] * len(MOTOR_IDS),
+                )
+
+    # Enable torque
+    set_torque(motor_bus, enable=True)
+    current_acceleration = ACCELERATION
+
+
+def get_last_goal(motor_bus):
+    """Get the last goal position written, or the current position before any move"""
+    if last_goal is None:
+        return get_current_positions(motor_bus)
+    return last_goal
+
+
+def setup_telemetry(motor_bus, mqtt_client):
+    """Start sampling joint telemetry to disk and MQTT"""
+    global telemetry_sampler
+    telemetry_sampler = TelemetrySampler(
+        read_present=lambda: get_current_positions(motor_bus),
+        read_goal=lambda: get_last_goal(motor_bus),
+        log=TelemetryLog(TELEMETRY_DIR),
+        mqtt_client=mqtt_client,
+    )
+    telemetry_sampler.start()
+    print(f"Telemetry sampling started, logging to {TELEMETRY_DIR}/")
+    return telemetry_sampler
 
 
 def move_to_position(motor_bus, position, steps=20, delay=0.1):
@@ -95,9 +265,20 @@ def move_to_position(motor_bus, position, steps=20, delay=0.1):
     
     # Create and execute smooth path to target position
     path = interpolate_positions(current_positions, position, steps=steps)
+    next_step = time.perf_counter()
     for pos in path:
         set_goal(motor_bus, pos)
-        time.sleep(delay)
+        # Pace against absolute deadlines so bus and scheduling delays don't accumulate.
+        # Waiting on the abort event lets a stop interrupt the move between steps.
+        next_step += delay
+        motion_wait(max(next_step - time.perf_counter(), 0))
+
+
+def motion_wait(timeout):
+    """Sleep for timeout seconds; raise MotionAborted if the running command has been stopped"""
+    abort_motion.wait(timeout)
+    if running_generation != stop_generation:
+        raise MotionAborted()
 
 
 def interpolate_positions(start_pos, end_pos, steps=20):
@@ -113,52 +294,39 @@ def interpolate_positions(start_pos, end_pos, steps=20):
     return result
 
 
-def execute_sequence(motor_bus, positions, steps=15, delay=0.05, pause=0.5, mqtt_client=None, sequence_key=None):
-    """Execute a sequence of positions with smooth transitions and send status updates"""
+def execute_sequence(motor_bus, positions, steps=15, delay=0.05, pause=0.5, mqtt_client=None, sequence_key=None,
+                     profiles=None):
+    """Execute a sequence of positions with smooth transitions and send status updates.
+
+    profiles holds one tuned speed profile per position (steps, delay, pause,
+    acceleration); without it every position uses steps, delay, pause and ACCELERATION.
+    """
     for i, position in enumerate(positions):
-        move_to_position(motor_bus, position, steps=steps, delay=delay)
+        profile = profiles[i] if profiles else {"steps": steps, "delay": delay, "pause": pause,
+                                                 "acceleration": ACCELERATION}
+        set_acceleration(motor_bus, profile["acceleration"])
+        move_to_position(motor_bus, position, steps=profile["steps"], delay=profile["delay"])
         
         # Send progress update if MQTT client is provided
         if mqtt_client and sequence_key is not None:
-            progress = {
-                "status": "in_progress",
-                "position_key": sequence_key,
-                "position_index": i,
-                "total_positions": len(positions),
-                "timestamp": time.time()
-            }
-            mqtt_client.publish(MQTT_STATUS_TOPIC, json.dumps(progress))
-            print(f"Published progress: {progress}")
+            progress = publish_status("in_progress", position_key=sequence_key,
+                                      position_index=i, total_positions=len(positions))
+            if VERBOSE_STATUS:
+                print(f"Published progress: {progress}")
             
-        time.sleep(pause)  # Pause at each position
+        motion_wait(profile["pause"])  # Pause at each position
     
     # Send completion status if MQTT client is provided
     if mqtt_client and sequence_key is not None:
-        completion = {
-            "status": "completed",
-            "position_key": sequence_key,
-            "timestamp": time.time()
-        }
-        mqtt_client.publish(MQTT_STATUS_TOPIC, json.dumps(completion))
+        completion = publish_status("completed", position_key=sequence_key)
         print(f"Published completion: {completion}")
 
 
-def getch():
-    """Get a single character from standard input"""
-    fd = sys.stdin.fileno()
-    old_settings = termios.tcgetattr(fd)
-    try:
-        tty.setraw(sys.stdin.fileno())
-        ch = sys.stdin.read(1)
-    finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-    return ch
-
-
-def kbhit():
-    """Check if a keypress is available"""
-    dr, dw, de = select.select([sys.stdin], [], [], 0)
-    return dr != []
+def publish_status(status, **fields):
+    """Publish a status update through the shared status publisher"""
+    if status_publisher is None:
+        return None
+    return status_publisher.publish(status, **fields)
 
 
 def on_connect(client, userdata, flags, rc):
@@ -183,16 +351,25 @@ def on_message(client, userdata, msg):
             print(f"Received command to move to position key: {position_key}")
             
             # Send acknowledgment that command was received
-            ack = {
-                "status": "received",
-                "position_key": position_key,
-                "timestamp": time.time()
-            }
-            client.publish(MQTT_STATUS_TOPIC, json.dumps(ack))
-            print(f"Published acknowledgment: {ack}")
+            publish_status("received", position_key=position_key)
             
-            # Process the command
-            process_command(position_key, userdata['motor_bus'], userdata['sequences'], client)
+            # Queue the command for the motion thread
+            queue_command(position_key)
+        elif data.get("command") == "execute_positions" and "positions" in data:
+            position_key = data.get("position_key", -1)
+            positions = data["positions"]
+            try:
+                check_positions(positions)
+            except ValueError as e:
+                # Nothing is queued; the sender's wait fails on this error
+                print(f"Rejected planned positions for key {position_key}: {e}")
+                publish_status("error", position_key=position_key, error_message=str(e))
+                return
+            print(f"Received command to execute {len(positions)} planned positions (key {position_key})")
+            publish_status("received", position_key=position_key)
+            queue_command(position_key, positions)
+        elif data.get("command") == "stop":
+            emergency_stop()
         else:
             print(f"Invalid MQTT message format: {payload}")
     except json.JSONDecodeError:
@@ -201,19 +378,17 @@ def on_message(client, userdata, msg):
         print(f"Error processing MQTT message: {e}")
         # Send error status
         try:
-            error_status = {
-                "status": "error",
-                "error_message": str(e),
-                "timestamp": time.time()
-            }
-            client.publish(MQTT_STATUS_TOPIC, json.dumps(error_status))
+            publish_status("error", error_message=str(e))
         except:
             pass
 
 
 def setup_mqtt_client(motor_bus, sequences):
     """Setup and start the MQTT client"""
+    global status_publisher
     client = mqtt.Client()
+    status_publisher = StatusPublisher(client, MQTT_STATUS_TOPIC, encoding=STATUS_ENCODING,
+                                       batch_interval=STATUS_BATCH_INTERVAL)
     
     # Store motor_bus and sequences in userdata for use in callbacks
     client.user_data_set({
@@ -225,77 +400,126 @@ def setup_mqtt_client(motor_bus, sequences):
     client.on_connect = on_connect
     client.on_message = on_message
     
-    # Connect to broker
+    # Connect to broker; main() drives the client from its event loop
     try:
         client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        
-        # Start MQTT loop in a background thread
-        client.loop_start()
-        print(f"MQTT client started and connected to {MQTT_BROKER}:{MQTT_PORT}")
+        print(f"MQTT client connected to {MQTT_BROKER}:{MQTT_PORT}")
         return client
     except Exception as e:
         print(f"Failed to connect to MQTT broker: {e}")
         return None
 
 
-def process_command(key_num, motor_bus, sequences, mqtt_client=None):
-    """Process a command to execute a sequence for the given key"""
+def process_command(key_num, motor_bus, sequences, mqtt_client=None, positions=None):
+    """Process a command to execute a sequence for the given key.
+
+    If positions is given (e.g. a pick adjusted to a detected object), it is
+    executed instead of the recorded sequence and key_num only labels the
+    status updates.
+    """
     try:
         key_num = int(key_num)
-        sequence_positions = get_sequence_by_key(sequences, key_num)
+        sequence_positions = positions if positions is not None else get_sequence_by_key(sequences, key_num)
+        # Tuned profiles only fit the recorded waypoints they were measured on
+        profiles = None
+        if positions is None:
+            profiles = get_profiles_by_key(sequences, key_num, start=get_current_positions(motor_bus))
         
         if sequence_positions:
             print(f"Executing sequence {key_num} with {len(sequence_positions)} positions...")
             
             # Send started status
             if mqtt_client:
-                started = {
-                    "status": "started",
-                    "position_key": key_num,
-                    "timestamp": time.time()
-                }
-                mqtt_client.publish(MQTT_STATUS_TOPIC, json.dumps(started))
+                started = publish_status("started", position_key=key_num)
                 print(f"Published started: {started}")
             
-            # Execute the sequence with MQTT client for status updates
-            execute_sequence(motor_bus, sequence_positions, mqtt_client=mqtt_client, sequence_key=key_num)
+            # Tag telemetry samples with this command so they can be queried later
+            if telemetry_sampler is not None:
+                command_id = telemetry_sampler.begin_command(key_num)
+                print(f"Telemetry command id: {command_id}")
+            try:
+                # Execute the sequence with MQTT client for status updates
+                execute_sequence(motor_bus, sequence_positions, mqtt_client=mqtt_client, sequence_key=key_num,
+                                 profiles=profiles)
+            except MotionAborted:
+                # Hold where the arm is instead of finishing the step it was interpolating
+                set_goal(motor_bus, get_current_positions(motor_bus))
+                print(f"Sequence {key_num} stopped")
+                if mqtt_client:
+                    publish_status("stopped", position_key=key_num)
+            finally:
+                if telemetry_sampler is not None:
+                    telemetry_sampler.end_command()
         else:
             print(f"No sequence found for key {key_num}")
             # Send not found status
             if mqtt_client:
-                not_found = {
-                    "status": "error",
-                    "error_message": f"No sequence found for key {key_num}",
-                    "timestamp": time.time()
-                }
-                mqtt_client.publish(MQTT_STATUS_TOPIC, json.dumps(not_found))
+                publish_status("error", error_message=f"No sequence found for key {key_num}")
     except ValueError:
         print(f"Invalid key number: {key_num}")
         # Send error status
         if mqtt_client:
-            error_status = {
-                "status": "error",
-                "error_message": f"Invalid key number: {key_num}",
-                "timestamp": time.time()
-            }
-            mqtt_client.publish(MQTT_STATUS_TOPIC, json.dumps(error_status))
-
-
-def keyboard_input_thread(motor_bus, sequences, running, mqtt_client):
-    """Thread function to handle keyboard input"""
-    print("Keyboard input thread started")
-    print("Press keys 0-9 to execute sequences, 'q' to exit.")
-    
-    while running['value']:
-        # Wait for key press using standard input
-        key = getch()
-        
+            publish_status("error", error_message=f"Invalid key number: {key_num}")
+
+
+def queue_command(key_num, positions=None):
+    """Queue a command for the motion thread under the current stop generation"""
+    command_queue.put((stop_generation, key_num, positions))
+
+
+def emergency_stop():
+    """Drop queued commands and stop the running sequence at its next step.
+
+    Only called from the event loop thread, which is also the only thread
+    queuing commands.
+    """
+    global stop_generation
+    stop_generation += 1
+    abort_motion.set()
+    dropped = 0
+    while True:
+        try:
+            command = command_queue.get_nowait()
+        except queue.Empty:
+            break
+        dropped += 1
+        # Senders waiting on a dropped command must not take it as still pending
+        publish_status("stopped", position_key=command[1])
+    print(f"Stop requested ({dropped} queued commands dropped)")
+
+
+def motion_worker(motor_bus, sequences, mqtt_client):
+    """Thread function running queued commands in order until it gets None"""
+    global running_generation
+    while True:
+        command = command_queue.get()
+        if command is None:
+            break
+        generation, key_num, positions = command
+        # Clear before checking, so a stop from here on wakes motion_wait
+        abort_motion.clear()
+        if generation != stop_generation:
+            # Taken off the queue just before a stop drained it
+            print(f"Sequence {key_num} stopped before it started")
+            publish_status("stopped", position_key=key_num)
+            continue
+        running_generation = generation
+        process_command(key_num, motor_bus, sequences, mqtt_client, positions=positions)
+
+
+def handle_keys(loop):
+    """Event loop callback for stdin (in cbreak mode, so keys arrive one by one)"""
+    keys = os.read(sys.stdin.fileno(), 64).decode(errors="ignore")
+    if not keys:
+        loop.stop()  # stdin closed
+    for key in keys:
         if key in '0123456789':
-            key_num = int(key)
-            process_command(key_num, motor_bus, sequences, mqtt_client)
-        elif key in ['q', 'Q', '\x1b']:  # q, Q or ESC
+            queue_command(int(key))
+        elif key in STOP_KEYS:
+            emergency_stop()
+        elif key in QUIT_KEYS:
             print("Exiting...")
-            running['value'] = False
+            loop.stop()
 
 
 def main():
@@ -316,30 +540,13 @@ def main():
     print("Robot arm control initialized.")
     
     try:
-        # Disable torque to configure motors
-        set_torque(motor_bus, enable=False)
-        
-        # Configure motors for smooth movement
-        for field, value in (
-            ("Mode", 0),
-            ("P_Coefficient", PID_P),
-            ("I_Coefficient", PID_I),
-            ("D_Coefficient", PID_D),
-            ("Maximum_Acceleration", ACCELERATION),
-            ("Acceleration", ACCELERATION),
-        ):
-            motor_bus.write_with_motor_ids(
-                motor_models=MOTOR_MODELS,
-                motor_ids=MOTOR_IDS,
-                data_name=field,
-                values=[value] * len(MOTOR_IDS),
-            )
-        
-        # Enable torque
-        set_torque(motor_bus, enable=True)
+        configure_motors(motor_bus)
         
         # Set up MQTT client
         mqtt_client = setup_mqtt_client(motor_bus, sequences)
+
+        if TELEMETRY_ENABLED:
+            setup_telemetry(motor_bus, mqtt_client)
         
         # Start at home position (using sequence 0's first position)
         home_sequence = get_sequence_by_key(sequences, 0)
@@ -349,39 +556,59 @@ def main():
             
             # Send home position status
             if mqtt_client:
-                home_status = {
-                    "status": "initialized",
-                    "position": "home",
-                    "timestamp": time.time()
-                }
-                mqtt_client.publish(MQTT_STATUS_TOPIC, json.dumps(home_status))
-        
-        # Use a dict with a 'value' key for the running flag so it can be modified by reference
-        running = {'value': True}
+                publish_status("initialized", position="home")
         
-        # Start keyboard input thread
-        kb_thread = Thread(target=keyboard_input_thread, args=(motor_bus, sequences, running, mqtt_client))
-        kb_thread.daemon = True
-        kb_thread.start()
-        
-        # Main thread just waits until running becomes False
-        while running['value']:
-            time.sleep(0.1)
-                
+        motion_thread = Thread(target=motion_worker, args=(motor_bus, sequences, mqtt_client), name="motion")
+        motion_thread.start()
+
+        # The main thread sleeps in select() until a key, an MQTT packet, a
+        # timer or a signal arrives, and handles each one immediately
+        loop = EventLoop()
+        loop.add_signal_handler(signal.SIGINT, loop.stop)
+        loop.add_signal_handler(signal.SIGTERM, loop.stop)
+        if mqtt_client:
+            attach_mqtt(loop, mqtt_client, misc_interval=MQTT_MISC_INTERVAL)
+
+        # Keyboard control only with a terminal (not when launched headless, e.g. by smartreach_launcher.py)
+        terminal_settings = None
+        if sys.stdin.isatty():
+            terminal_settings = termios.tcgetattr(sys.stdin.fileno())
+            tty.setcbreak(sys.stdin.fileno())
+            loop.add_reader(sys.stdin.fileno(), lambda: handle_keys(loop))
+            print("Press keys 0-9 to execute sequences, space to stop the arm, 'q' to exit.")
+        else:
+            print("No terminal attached, keyboard control disabled; Ctrl-C or SIGINT to exit.")
+
+        try:
+            loop.run()
+        finally:
+            if terminal_settings is not None:
+                termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, terminal_settings)
+            # A second Ctrl-C (or the launcher's SIGINT) must not interrupt the cleanup
+            # below, which publishes shutdown, disables torque and closes the bus
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            loop.close(restore_signals=False)
+
     finally:
         # Ensure we cleanup before exit
         print("Shutting down...")
+
+        # Stop any running sequence before the motion thread exits
+        if 'motion_thread' in locals():
+            emergency_stop()
+            command_queue.put(None)
+            motion_thread.join()
+
+        if telemetry_sampler is not None:
+            telemetry_sampler.stop()
+            print("Telemetry log flushed")
         
         # Send shutdown status
         if 'mqtt_client' in locals() and mqtt_client is not None:
-            shutdown_status = {
-                "status": "shutdown",
-                "timestamp": time.time()
-            }
-            mqtt_client.publish(MQTT_STATUS_TOPIC, json.dumps(shutdown_status))
-            
-            # Stop MQTT client
-            mqtt_client.loop_stop()
+            # The event loop is gone, so let paho write the last packets itself
+            mqtt_client.on_socket_register_write = None
+            publish_status("shutdown")
             mqtt_client.disconnect()
             print("MQTT client disconnected")
         
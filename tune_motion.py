@@ -0,0 +1,102 @@
+"""Tune per-segment speed profiles for the recorded sequences.
+
+Runs every segment of each sequence at increasing speed on the arm (or the
+simulator), keeps the fastest profile that tracks and settles within the
+limits in utils/motion_tuning.py, and stores the profiles in
+robot_sequences.json, where testv4.py picks them up. Segment 0 is tuned from
+the home position (the first position of sequence 0). When a sequence starts
+farther away than that, testv4.py runs its first move at the default speed.
+Stop testv4.py first; tuning needs the serial port to itself.
+
+    python tune_motion.py --sim            # try it on the simulated arm
+    python tune_motion.py --keys 3 5 7     # tune some keys on the arm
+    python tune_motion.py --report         # cycle times of the stored profiles
+"""
+import argparse
+import json
+import logging
+from utils.motion_tuning import SegmentTuner, SETTLE_TOLERANCE, TRIALS, cycle_time
+
+JSON_FILE = "robot_sequences.json"
+HOME_KEY = 0
+MOTOR_IDS = [1, 2, 3, 4, 5, 6]
+
+
+def connect_arm():
+    """Open and configure the arm the way testv4 does"""
+    import testv4
+    from lerobot.common.robot_devices.motors.configs import FeetechMotorsBusConfig
+    from lerobot.common.robot_devices.motors.feetech import FeetechMotorsBus
+    motor_bus = FeetechMotorsBus(FeetechMotorsBusConfig(port=testv4.PORT, motors={"motor": (-1, testv4.MOTOR_MODEL)}))
+    motor_bus.connect()
+    testv4.configure_motors(motor_bus)
+    return motor_bus, lambda: testv4.set_torque(motor_bus, enable=False)
+
+
+def connect_sim(home):
+    from utils.sim_arm import SimulatedMotorBus
+    motor_bus = SimulatedMotorBus(MOTOR_IDS, initial_positions=home)
+    motor_bus.write_with_motor_ids(None, MOTOR_IDS, "Torque_Enable", 1)
+    return motor_bus, lambda: None
+
+
+def report(sequences, measured=None):
+    print(f"{'key':>4}{'segments':>10}{'default s':>11}{'tuned s':>9}{'gain':>8}{'measured s':>12}")
+    total_default = total_tuned = 0.0
+    for sequence in sequences:
+        default, tuned = cycle_time(sequence, tuned=False), cycle_time(sequence)
+        total_default += default
+        total_tuned += tuned
+        actual = measured.get(sequence["key"]) if measured else None
+        print(f"{sequence['key']:>4}{len(sequence['positions']):>10}{default:>11.2f}{tuned:>9.2f}"
+              f"{(default - tuned) / default:>8.0%}{actual if actual is not None else '-':>12}")
+    if total_default:
+        print(f"{'all':>4}{'':>10}{total_default:>11.2f}{total_tuned:>9.2f}"
+              f"{(total_default - total_tuned) / total_default:>8.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune per-segment speed profiles")
+    parser.add_argument("--keys", type=int, nargs="+", help="Sequence keys to tune (default: all)")
+    parser.add_argument("--sim", action="store_true", help="Tune on the simulated arm")
+    parser.add_argument("--trials", type=int, default=TRIALS, help="Runs per candidate profile")
+    parser.add_argument("--dry-run", action="store_true", help=f"Don't write {JSON_FILE}")
+    parser.add_argument("--report", action="store_true", help="Only print cycle times of the stored profiles")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+
+    with open(JSON_FILE) as file:
+        sequences = json.load(file)
+    if args.report:
+        report(sequences)
+        return
+    home = next(sequence["positions"][0] for sequence in sequences if sequence["key"] == HOME_KEY)
+    selected = [sequence for sequence in sequences if args.keys is None or sequence["key"] in args.keys]
+
+    motor_bus, release = connect_sim(home) if args.sim else connect_arm()
+    tuner = SegmentTuner(motor_bus, MOTOR_IDS, trials=args.trials)
+    measured = {}
+    try:
+        for sequence in selected:
+            print(f"Tuning sequence {sequence['key']} ({len(sequence['positions'])} segments)...")
+            sequence["profiles"] = tuner.tune_sequence(sequence["positions"], home)
+            duration, final_error = tuner.measure_sequence(sequence["positions"], sequence["profiles"], home)
+            measured[sequence["key"]] = f"{duration:.2f}"
+            if final_error > SETTLE_TOLERANCE:
+                print(f"  warning: ended {final_error} ticks from the last waypoint")
+    finally:
+        tuner.move_to(home)
+        release()
+        motor_bus.disconnect()
+
+    print()
+    report(selected, measured)
+    if not args.dry_run:
+        with open(JSON_FILE, "w") as file:
+            json.dump(sequences, file, indent=4)
+        print(f"Profiles saved to {JSON_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Camera to arm calibration for each check position.
+
+At a check position the camera looks at the table from a fixed pose, so a
+plane homography maps image points (normalized 0-1000, as returned by
+Gemini) to table coordinates in the arm's base frame (mm, same frame as
+IK.py).
+
+Each check position also stores a reference point: the image location
+where the object sits when the recorded pick sequence grasps it. A
+detection's offset from that point, converted to mm, is the correction
+applied to the pick waypoints.
+
+To calibrate, place a marker at four or more spots on the table and note
+where it appears in the image at the check position and where the grasp
+point is when you jog the arm onto it. Then call fit_homography and
+save_calibration.
+"""
+import json
+import os
+import numpy as np
+
+CALIBRATION_FILE = "camera_calibration.json"
+
+
+def fit_homography(image_points, arm_points):
+    """Least-squares homography (3x3) from four or more point pairs (DLT)"""
+    image_points = np.asarray(image_points, dtype=np.float64)
+    arm_points = np.asarray(arm_points, dtype=np.float64)
+    if len(image_points) < 4 or len(image_points) != len(arm_points):
+        raise ValueError("Need at least four matching image/arm point pairs")
+    rows = []
+    for (u, v), (x, y) in zip(image_points, arm_points):
+        rows.append([u, v, 1, 0, 0, 0, -x * u, -x * v, -x])
+        rows.append([0, 0, 0, u, v, 1, -y * u, -y * v, -y])
+    _, _, vt = np.linalg.svd(np.asarray(rows))
+    H = vt[-1].reshape(3, 3)
+    return H / H[2, 2]
+
+
+def image_to_arm(H, points):
+    """Map (N, 2) or (2,) normalized image points to table (x, y) in mm"""
+    points = np.asarray(points, dtype=np.float64)
+    homogeneous = np.column_stack([np.atleast_2d(points), np.ones(np.atleast_2d(points).shape[0])])
+    mapped = homogeneous @ np.asarray(H).T
+    result = mapped[:, :2] / mapped[:, 2:]
+    return result[0] if points.ndim == 1 else result
+
+
+def load_calibration(path=CALIBRATION_FILE):
+    """Return {check_position: {"homography": 3x3 array, "reference_point": (u, v)}}"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        data = json.load(file)
+    return {
+        int(key): {
+            "homography": np.asarray(entry["homography"]),
+            "reference_point": tuple(entry["reference_point"]),
+        }
+        for key, entry in data.items()
+    }
+
+
+def save_calibration(calibration, path=CALIBRATION_FILE):
+    data = {
+        str(key): {
+            "homography": np.asarray(entry["homography"]).tolist(),
+            "reference_point": list(entry["reference_point"]),
+        }
+        for key, entry in calibration.items()
+    }
+    with open(path, "w") as file:
+        json.dump(data, file, indent=4)
+
+
+def detection_offset(calibration, check_position, image_point):
+    """Table offset (dx, dy) in mm of a detection from the recorded pick spot, or None"""
+    entry = calibration.get(check_position)
+    if entry is None or image_point is None:
+        return None
+    H = entry["homography"]
+    return image_to_arm(H, image_point) - image_to_arm(H, entry["reference_point"])
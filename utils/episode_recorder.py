@@ -0,0 +1,192 @@
+"""Episode recorder: captured frames linked to pose, prompt and Gemini decision.
+
+Records are appended to chunked archives under EPISODE_DIR:
+
+    chunk_00001.bin   concatenated JPEG bytes
+    chunk_00001.idx   one JSON line per record with its offset and length
+                      into the .bin file plus the metadata
+
+Writes happen on a background thread fed by a bounded queue, so the control
+loop never waits on JPEG encoding or disk I/O. When the queue is full, new
+records are dropped and counted instead of blocking. The oldest chunks are
+deleted once the archive exceeds its byte budget.
+"""
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+EPISODE_DIR = "episodes"
+MAX_PENDING_RECORDS = 16
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+MAX_ARCHIVE_BYTES = 2 * 1024 * 1024 * 1024
+JPEG_QUALITY = 90
+
+
+def encode_jpeg(frame, quality=JPEG_QUALITY):
+    """Encode a BGR frame as JPEG bytes; bytes are passed through unchanged"""
+    if isinstance(frame, (bytes, bytearray)):
+        return bytes(frame)
+    import cv2
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def decode_jpeg(jpeg):
+    """Decode JPEG bytes back into a BGR frame"""
+    import cv2
+    import numpy as np
+    return cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _chunk_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, "chunk_*.idx")))
+
+
+class EpisodeRecorder:
+    """Asynchronous writer for (frame, pose, prompt, decision, latency) records"""
+
+    def __init__(self, directory=EPISODE_DIR, max_pending=MAX_PENDING_RECORDS,
+                 max_chunk_bytes=MAX_CHUNK_BYTES, max_bytes=MAX_ARCHIVE_BYTES):
+        self.directory = directory
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_bytes = max_bytes
+        self.episode_id = time.strftime("%Y%m%d_%H%M%S")
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._data_file = None
+        self._index_file = None
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="episode-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, frame, sequence_key=None, joint_state=None, prompt=None,
+               decision=None, latencies=None, **extra):
+        """Queue a record without blocking; returns False if it had to be dropped.
+
+        frame may be a BGR ndarray (encoded on the writer thread) or JPEG
+        bytes. The caller must not modify the array after handing it over.
+        """
+        record = {
+            "timestamp": time.time(),
+            "episode_id": self.episode_id,
+            "sequence_key": sequence_key,
+            "joint_state": list(joint_state) if joint_state is not None else None,
+            "prompt": prompt,
+            "decision": decision,
+            "latencies": latencies or {},
+        }
+        record.update(extra)
+        try:
+            self._queue.put_nowait((frame, record))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Episode writer is behind, dropped record ({self.dropped} total)")
+            return False
+
+    def close(self):
+        """Write everything still queued and close the archive"""
+        self._queue.put((None, None))
+        self._thread.join()
+        for file in (self._data_file, self._index_file):
+            if file is not None:
+                file.close()
+
+    def _run(self):
+        while True:
+            frame, record = self._queue.get()
+            if record is None:
+                return
+            try:
+                self._write(encode_jpeg(frame), record)
+            except Exception as e:
+                logger.error(f"Failed to write episode record: {e}")
+
+    def _open_chunk(self):
+        for file in (self._data_file, self._index_file):
+            if file is not None:
+                file.close()
+        existing = _chunk_paths(self.directory)
+        number = int(os.path.basename(existing[-1])[len("chunk_"):-len(".idx")]) + 1 if existing else 1
+        base = os.path.join(self.directory, f"chunk_{number:05d}")
+        self._data_file = open(base + ".bin", "ab")
+        self._index_file = open(base + ".idx", "a")
+        self._chunk_name = os.path.basename(base)
+        self._rotate()
+
+    def _write(self, jpeg, record):
+        if self._data_file is None or self._data_file.tell() + len(jpeg) > self.max_chunk_bytes:
+            self._open_chunk()
+        record["chunk"] = self._chunk_name
+        record["offset"] = self._data_file.tell()
+        record["length"] = len(jpeg)
+        self._data_file.write(jpeg)
+        self._data_file.flush()
+        # The index line is written last so readers never see a record without its bytes
+        self._index_file.write(json.dumps(record) + "\n")
+        self._index_file.flush()
+
+    def _rotate(self):
+        chunks = _chunk_paths(self.directory)
+        sizes = [os.path.getsize(path) + os.path.getsize(path[:-4] + ".bin") for path in chunks]
+        total = sum(sizes)
+        # Never delete the chunk that was just opened
+        for path, size in zip(chunks[:-1], sizes):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            os.remove(path[:-4] + ".bin")
+            total -= size
+            logger.info(f"Episode archive over budget, removed {os.path.basename(path)[:-4]}")
+
+
+class EpisodeReader:
+    """Random access to recorded episodes for replay and offline evaluation"""
+
+    def __init__(self, directory=EPISODE_DIR):
+        self.directory = directory
+        self.records = []
+        self._files = {}
+        for path in _chunk_paths(directory):
+            with open(path) as index_file:
+                for line in index_file:
+                    if line.endswith("\n"):
+                        self.records.append(json.loads(line))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        record = dict(self.records[i])
+        record["jpeg"] = self.read_jpeg(self.records[i])
+        return record
+
+    def __iter__(self):
+        for i in range(len(self.records)):
+            yield self[i]
+
+    def read_jpeg(self, record):
+        data_file = self._files.get(record["chunk"])
+        if data_file is None:
+            data_file = open(os.path.join(self.directory, record["chunk"] + ".bin"), "rb")
+            self._files[record["chunk"]] = data_file
+        data_file.seek(record["offset"])
+        return data_file.read(record["length"])
+
+    def select(self, **criteria):
+        """Indices of records whose fields equal all the given values"""
+        return [i for i, record in enumerate(self.records)
+                if all(record.get(name) == value for name, value in criteria.items())]
+
+    def close(self):
+        for data_file in self._files.values():
+            data_file.close()
+        self._files = {}
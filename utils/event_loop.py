@@ -0,0 +1,257 @@
+"""Single-threaded selector loop for the controller scripts.
+
+Multiplexes file descriptors (stdin, the MQTT socket), timers and shutdown
+signals in one select() call. The loop sleeps until something is ready or
+the next timer is due, so an idle controller makes no wakeups at all, and
+a key press, MQTT command or SIGINT is handled as soon as it arrives.
+
+Callbacks run on the loop thread and must not block; long work (moving the
+arm) belongs on a worker thread that hands results back with
+call_soon_threadsafe().
+"""
+import heapq
+import itertools
+import logging
+import os
+import selectors
+import signal
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MQTT_ERR_SUCCESS = 0  # paho.mqtt.client.MQTT_ERR_SUCCESS, without importing paho here
+
+
+class EventLoop:
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self._timers = []
+        self._timer_ids = itertools.count()
+        self._cancelled = set()
+        self._pending = []
+        self._running = False
+        self._signal_handlers = {}
+        self._old_wakeup_fd = None
+        # Self-pipe: other threads and signal handlers write a byte to wake select()
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+        self.selector.register(self._wake_read, selectors.EVENT_READ, (self._drain_wakeups, None))
+
+    def add_reader(self, fileobj, callback):
+        """Call callback() whenever fileobj is readable"""
+        self._add(fileobj, selectors.EVENT_READ, callback, None)
+
+    def add_writer(self, fileobj, callback):
+        """Call callback() whenever fileobj is writable"""
+        self._add(fileobj, selectors.EVENT_WRITE, None, callback)
+
+    def remove_reader(self, fileobj):
+        self._remove(fileobj, selectors.EVENT_READ)
+
+    def remove_writer(self, fileobj):
+        self._remove(fileobj, selectors.EVENT_WRITE)
+
+    def _add(self, fileobj, event, reader, writer):
+        try:
+            key = self.selector.get_key(fileobj)
+        except KeyError:
+            self.selector.register(fileobj, event, (reader, writer))
+            return
+        old_reader, old_writer = key.data
+        self.selector.modify(fileobj, key.events | event, (reader or old_reader, writer or old_writer))
+
+    def _remove(self, fileobj, event):
+        try:
+            key = self.selector.get_key(fileobj)
+        except (KeyError, ValueError):
+            return
+        events = key.events & ~event
+        reader, writer = key.data
+        if not events:
+            self.selector.unregister(fileobj)
+        elif event == selectors.EVENT_READ:
+            self.selector.modify(fileobj, events, (None, writer))
+        else:
+            self.selector.modify(fileobj, events, (reader, None))
+
+    def call_later(self, delay, callback):
+        """Run callback() once after delay seconds; returns an id for cancel()"""
+        timer_id = next(self._timer_ids)
+        heapq.heappush(self._timers, (time.monotonic() + delay, timer_id, callback, None))
+        return timer_id
+
+    def call_every(self, interval, callback):
+        """Run callback() every interval seconds on absolute deadlines; returns an id for cancel()"""
+        timer_id = next(self._timer_ids)
+        heapq.heappush(self._timers, (time.monotonic() + interval, timer_id, callback, interval))
+        return timer_id
+
+    def cancel(self, timer_id):
+        self._cancelled.add(timer_id)
+
+    def call_soon_threadsafe(self, callback):
+        """Run callback() on the loop thread; safe to call from any thread"""
+        self._pending.append(callback)
+        self._wake()
+
+    def add_signal_handler(self, signum, callback):
+        """Run callback() on the loop thread when the process receives signum"""
+        self._signal_handlers[signum] = callback
+        signal.signal(signum, lambda *args: self.call_soon_threadsafe(callback))
+        if self._old_wakeup_fd is None:
+            # Makes the interpreter write to the pipe itself, so a signal that
+            # arrives while select() is blocked still wakes it immediately
+            self._old_wakeup_fd = signal.set_wakeup_fd(self._wake_write, warn_on_full_buffer=False)
+
+    def stop(self):
+        """Make run() return; safe to call from any thread"""
+        self._running = False
+        self._wake()
+
+    def _wake(self):
+        try:
+            os.write(self._wake_write, b"\0")
+        except BlockingIOError:
+            pass  # pipe already full, the loop is going to wake anyway
+
+    def _drain_wakeups(self):
+        try:
+            while os.read(self._wake_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _timeout(self):
+        if self._pending or not self._running:
+            return 0
+        if not self._timers:
+            return None
+        return max(self._timers[0][0] - time.monotonic(), 0)
+
+    def _run_timers(self):
+        now = time.monotonic()
+        while self._timers and self._timers[0][0] <= now:
+            deadline, timer_id, callback, interval = heapq.heappop(self._timers)
+            if timer_id in self._cancelled:
+                self._cancelled.discard(timer_id)
+                continue
+            if interval is not None:
+                # Skip missed ticks rather than firing a burst after a stall
+                next_deadline = deadline + interval
+                if next_deadline <= now:
+                    next_deadline = now + interval
+                heapq.heappush(self._timers, (next_deadline, timer_id, callback, interval))
+            self._call(callback)
+
+    def _call(self, callback):
+        try:
+            callback()
+        except Exception:
+            logger.exception("Error in event loop callback")
+
+    def run(self):
+        """Dispatch events until stop() is called"""
+        self._running = True
+        while self._running:
+            for key, events in self.selector.select(self._timeout()):
+                reader, writer = key.data
+                if events & selectors.EVENT_READ and reader is not None:
+                    self._call(reader)
+                if events & selectors.EVENT_WRITE and writer is not None:
+                    self._call(writer)
+            while self._pending:
+                self._call(self._pending.pop(0))
+            self._run_timers()
+
+    def close(self, restore_signals=True):
+        """Release the loop. With restore_signals=False the caller has already
+        replaced the loop's signal handlers (e.g. with SIG_IGN) and keeps them."""
+        if self._old_wakeup_fd is not None:
+            signal.set_wakeup_fd(self._old_wakeup_fd)
+            self._old_wakeup_fd = None
+        if restore_signals:
+            for signum in self._signal_handlers:
+                signal.signal(signum, signal.SIG_DFL if signum != signal.SIGINT else signal.default_int_handler)
+        self._signal_handlers = {}
+        self.selector.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+
+def attach_mqtt(loop, client, misc_interval=1.0):
+    """Drive a connected paho client from the loop instead of loop_start()'s thread.
+
+    loop_misc() runs every misc_interval for keepalives, and reconnects the
+    client if the broker connection dropped. The reconnect is a blocking TCP
+    connect (up to paho's connect timeout), so it runs on a short-lived thread
+    and hands the new socket back to the loop; stdin and signals stay live.
+    """
+    # Registered by fd number: paho closes its socket on disconnect, and a
+    # closed socket object can no longer be looked up in the selector
+    state = {"fd": None, "reconnecting": False}
+
+    def register():
+        sock = client.socket()
+        if sock is not None:
+            state["fd"] = sock.fileno()
+            loop.add_reader(state["fd"], on_readable)
+            update_writer()
+
+    def unregister():
+        if state["fd"] is not None:
+            loop.remove_reader(state["fd"])
+            loop.remove_writer(state["fd"])
+            state["fd"] = None
+
+    def update_writer():
+        # Only watch for writability while paho has data queued
+        if state["fd"] is None:
+            return
+        if client.want_write():
+            loop.add_writer(state["fd"], on_writable)
+        else:
+            loop.remove_writer(state["fd"])
+
+    def check(rc):
+        sock = client.socket()
+        if rc != MQTT_ERR_SUCCESS or sock is None or sock.fileno() != state["fd"]:
+            unregister()
+        else:
+            update_writer()
+
+    def on_readable():
+        check(client.loop_read())
+
+    def on_writable():
+        check(client.loop_write())
+
+    def reconnect():
+        # Runs on its own thread
+        try:
+            client.reconnect()
+        except OSError as e:
+            logger.warning(f"MQTT reconnect failed: {e}")
+            loop.call_soon_threadsafe(lambda: finish_reconnect(False))
+            return
+        loop.call_soon_threadsafe(lambda: finish_reconnect(True))
+
+    def finish_reconnect(connected):
+        state["reconnecting"] = False
+        if connected:
+            register()
+
+    def on_misc():
+        if state["reconnecting"]:
+            return
+        if state["fd"] is None:
+            state["reconnecting"] = True
+            threading.Thread(target=reconnect, name="mqtt-reconnect", daemon=True).start()
+            return
+        check(client.loop_misc())
+
+    register()
+    loop.call_every(misc_interval, on_misc)
+    # publish() from other threads queues data; have the loop flush it
+    client.on_socket_register_write = lambda *args: loop.call_soon_threadsafe(update_writer)
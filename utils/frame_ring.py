@@ -0,0 +1,178 @@
+"""Shared-memory frame ring between the camera process and its readers.
+
+Layout of the shared block (all little-endian, native alignment):
+
+    int64[3]              shape of one frame (height, width, channels)
+    int64                 number of slots
+    int64                 sequence number of the newest frame (0 = none yet)
+    int64[slots]          sequence number held by each slot (-1 while writing)
+    float64[slots]        capture time of each slot (time.time())
+    uint8[slots, h, w, c] frame data
+
+The camera process is the only writer. Readers get NumPy views straight into
+the shared block (no copy). A view stays valid until the writer wraps around
+to its slot, slots - 1 frames later; check with is_current() or copy.
+
+The camera process and the launcher talk over a multiprocessing Pipe using
+small tuples:
+
+    camera -> launcher   ("ready", ring_name, shape)
+                         ("error", message)
+    launcher -> camera   ("stop",)
+"""
+import logging
+import os
+import time
+from multiprocessing import shared_memory
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+RING_ENV = "SMARTREACH_FRAME_RING"
+DEFAULT_SLOTS = 4
+CAMERA_FPS = 15
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 every attaching process registers the block with
+        # a resource tracker, which unlinks it when that reader exits. Skip the
+        # registration; the camera process owns the block.
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class FrameRing:
+    def __init__(self, name=None, shape=None, slots=DEFAULT_SLOTS, create=False):
+        """Create a ring for frames of the given shape, or attach to an existing one by name"""
+        if create:
+            header = 8 * (5 + 2 * slots)
+            size = header + slots * int(np.prod(shape))
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            np.ndarray((3,), dtype=np.int64, buffer=self.shm.buf)[:] = shape
+            np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=24)[0] = slots
+        else:
+            self.shm = _attach(name)
+        buf = self.shm.buf
+        self.shape = tuple(int(v) for v in np.ndarray((3,), dtype=np.int64, buffer=buf))
+        self.slots = int(np.ndarray((1,), dtype=np.int64, buffer=buf, offset=24)[0])
+        offset = 32
+        self._latest = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += 8
+        self._slot_seq = np.ndarray((self.slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += 8 * self.slots
+        self._slot_time = np.ndarray((self.slots,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += 8 * self.slots
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=buf, offset=offset)
+        if create:
+            self._latest[0] = 0
+            self._slot_seq[:] = 0
+        self.name = self.shm.name
+
+    def write(self, frame):
+        """Publish a frame; only the camera process calls this"""
+        seq = int(self._latest[0]) + 1
+        slot = seq % self.slots
+        self._slot_seq[slot] = -1
+        self._frames[slot] = frame
+        self._slot_time[slot] = time.time()
+        self._slot_seq[slot] = seq
+        self._latest[0] = seq
+        return seq
+
+    def latest(self):
+        """Return (seq, timestamp, frame view) for the newest frame, or (0, None, None)"""
+        seq = int(self._latest[0])
+        if seq == 0:
+            return 0, None, None
+        slot = seq % self.slots
+        return seq, float(self._slot_time[slot]), self._frames[slot]
+
+    def is_current(self, seq):
+        """True while the slot of frame seq still holds that frame"""
+        return int(self._slot_seq[seq % self.slots]) == seq
+
+    def read_copy(self, convert=None):
+        """Copy of the newest frame that is guaranteed not to be torn, or None.
+
+        convert(view) replaces the plain copy when the caller needs a new
+        array anyway (a colour conversion, a resize), so the frame is read
+        out of the shared block only once. It is retried if the writer
+        reached the slot meanwhile.
+        """
+        while True:
+            seq, timestamp, view = self.latest()
+            if view is None:
+                return None
+            frame = view.copy() if convert is None else convert(view)
+            if self.is_current(seq):
+                return frame
+
+    def close(self):
+        # Drop our views before closing, or the buffer can't be released
+        self._latest = self._slot_seq = self._slot_time = self._frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def run_camera(conn, camera_index=0, fps=CAMERA_FPS, slots=DEFAULT_SLOTS):
+    """Camera process: capture frames into a new FrameRing until told to stop"""
+    import cv2
+    cap = cv2.VideoCapture(camera_index)
+    ret, frame = cap.read()
+    if not ret:
+        conn.send(("error", f"Failed to open camera {camera_index}"))
+        cap.release()
+        return
+    ring = FrameRing(shape=frame.shape, slots=slots, create=True)
+    conn.send(("ready", ring.name, frame.shape))
+    period = 1.0 / fps
+    next_frame = time.perf_counter()
+    try:
+        while not conn.poll(0):
+            ret, frame = cap.read()
+            if ret:
+                ring.write(frame)
+            next_frame += period
+            time.sleep(max(next_frame - time.perf_counter(), 0))
+    finally:
+        cap.release()
+        ring.close()
+        ring.unlink()
+
+
+_shared_ring = None
+
+
+def read_shared_frame(convert=None):
+    """Newest camera frame (BGR copy) from the ring named in the environment.
+
+    Returns None when no camera process is running, so callers can fall back
+    to opening the camera themselves. Callers get a private array rather than
+    a view because they keep frames for seconds (across a Gemini call, in an
+    episode recording), while the camera reuses a slot after slots - 1
+    frames. Pass convert to build that array straight from the shared slot
+    (see FrameRing.read_copy).
+    """
+    global _shared_ring
+    name = os.environ.get(RING_ENV)
+    if not name:
+        return None
+    if _shared_ring is None:
+        try:
+            _shared_ring = FrameRing(name=name)
+        except FileNotFoundError:
+            logger.warning(f"Frame ring {name} not found, falling back to direct capture")
+            return None
+    return _shared_ring.read_copy(convert)
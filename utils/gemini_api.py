@@ -1,39 +1,98 @@
-from google.generativeai import GenerativeModel
-import google.generativeai as genai
-from PIL import Image
 import os
-from dotenv import load_dotenv
-import numpy as np
-from pydantic import BaseModel, ValidationError, validator
+import json
+from utils.lazy_import import lazy_import
 
+# These take most of the startup time; load them on first use
+genai = lazy_import("google.generativeai")
+pydantic = lazy_import("pydantic")
+dotenv = lazy_import("dotenv")
 
-class GeminiDecision(BaseModel):
-    decision: str
+MODEL_NAME = "models/gemini-2.0-flash"
 
-    @validator('decision')
-    def must_be_yes_or_no(cls, v):
-        if v.lower() not in ['yes', 'no']:
-            raise ValueError('Decision must be either "yes" or "no"')
-        return v.lower()
+_configured = False
+
+def _to_pil(image):
+    from PIL import Image
+    if isinstance(image, Image.Image):
+        return image
+    return Image.fromarray(image)
 
 def setup_gemini_api():
-    load_dotenv()
+    global _configured
+    if _configured:
+        return
+    dotenv.load_dotenv()
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise Exception("GEMINI_API_KEY is not set in your .env file.")
     genai.configure(api_key=api_key)
+    _configured = True
+
+def decision_prompt(text_prompt):
+    return f"{text_prompt}\nPlease answer only yes or no."
 
-def process_image(image, text_prompt):
-    if isinstance(image, np.ndarray):
-        image = Image.fromarray(image)
+def generate_decision(image, text_prompt, model_name=MODEL_NAME):
+    """Send one yes/no query and return the raw Gemini response"""
+    image = _to_pil(image)
     setup_gemini_api()
-    model = GenerativeModel(model_name="models/gemini-2.0-flash")
-    refined_prompt = f"{text_prompt}\nPlease answer only yes or no."
-    response = model.generate_content([refined_prompt, image])
-    decision_str = response.text.strip()
+    model = genai.GenerativeModel(model_name=model_name)
+    return model.generate_content([decision_prompt(text_prompt), image])
+
+def parse_decision(text):
+    """Validate a reply with GeminiDecision; raises pydantic.ValidationError"""
+    from utils.gemini_models import GeminiDecision
+    return GeminiDecision(decision=text.strip()).decision
+
+def process_image(image, text_prompt, model_name=MODEL_NAME):
+    response = generate_decision(image, text_prompt, model_name)
     try:
-        decision_obj = GeminiDecision(decision=decision_str)
-        return decision_obj.decision
-    except ValidationError as e:
+        return parse_decision(response.text)
+    except pydantic.ValidationError as e:
         print("Pydantic validation error:", e)
-        return "no"
\ No newline at end of file
+        return "no"
+
+def detection_prompt(object_query):
+    return (
+        f"Is there a {object_query} in this image? Respond with JSON only: "
+        '{"found": true or false, "box_2d": [ymin, xmin, ymax, xmax]} '
+        "where box_2d is the bounding box of the object normalized to 0-1000, "
+        "or null if it is not found."
+    )
+
+def parse_detection(text):
+    """Validate a detection reply with GeminiDetection.
+
+    A bad box (fractional or out-of-range coordinates, wrong order) only
+    drops box_2d, so a positive answer stays positive and the pick falls back
+    to the recorded sequence. Raises ValueError or pydantic.ValidationError
+    when found itself can't be read.
+    """
+    from utils.gemini_models import GeminiDetection
+    data = json.loads(text)
+    if isinstance(data, list) and len(data) == 1:
+        # Some replies wrap the object in a list
+        data = data[0]
+    if not isinstance(data, dict) or "found" not in data:
+        raise ValueError(f"Expected an object with a found field, got {text!r}")
+    try:
+        return GeminiDetection(**data)
+    except pydantic.ValidationError as e:
+        print("Detection box rejected, keeping the decision:", e)
+        return GeminiDetection(found=data["found"])
+
+def locate_object(image, object_query):
+    """Ask Gemini whether the object is in frame and where, in a single call"""
+    from utils.gemini_models import GeminiDetection
+    image = _to_pil(image)
+    setup_gemini_api()
+    model = genai.GenerativeModel(model_name=MODEL_NAME)
+    prompt = detection_prompt(object_query)
+    response = model.generate_content(
+        [prompt, image],
+        generation_config={"response_mime_type": "application/json"},
+    )
+    try:
+        return parse_detection(response.text)
+    except (ValueError, TypeError, pydantic.ValidationError) as e:
+        print("Detection parsing error:", e)
+        return GeminiDetection(found=False)
@@ -0,0 +1,42 @@
+"""Pydantic models for Gemini replies.
+
+Kept apart from utils/gemini_api.py so importing that module doesn't load
+pydantic; its functions import these models on first use.
+"""
+from typing import List, Optional
+from pydantic import BaseModel, validator
+
+
+class GeminiDecision(BaseModel):
+    decision: str
+
+    @validator('decision')
+    def must_be_yes_or_no(cls, v):
+        if v.lower() not in ['yes', 'no']:
+            raise ValueError('Decision must be either "yes" or "no"')
+        return v.lower()
+
+class GeminiDetection(BaseModel):
+    found: bool
+    # [ymin, xmin, ymax, xmax] normalized to 0-1000, Gemini's native box format
+    box_2d: Optional[List[int]] = None
+
+    @validator('box_2d')
+    def must_be_normalized_box(cls, v, values):
+        if v is None:
+            return v
+        if len(v) != 4 or not all(0 <= c <= 1000 for c in v) or v[0] > v[2] or v[1] > v[3]:
+            raise ValueError('box_2d must be [ymin, xmin, ymax, xmax] within 0-1000')
+        return v
+
+    @property
+    def decision(self):
+        return "yes" if self.found else "no"
+
+    @property
+    def center(self):
+        """Box center as (x, y) normalized to 0-1000, or None"""
+        if not self.found or self.box_2d is None:
+            return None
+        ymin, xmin, ymax, xmax = self.box_2d
+        return ((xmin + xmax) / 2, (ymin + ymax) / 2)
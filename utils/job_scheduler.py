@@ -0,0 +1,248 @@
+import heapq
+import itertools
+from collections import deque
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Lower value runs first. Finishing a hand-over beats starting a new search.
+JOB_PRIORITIES = {
+    "drop": 0,
+    "show": 1,
+    "pick": 2,
+    "find": 3,
+}
+
+# Initial duration guesses (seconds) used for ETA until real runs are measured
+DEFAULT_JOB_DURATIONS = {
+    "drop": 8.0,
+    "show": 6.0,
+    "pick": 10.0,
+    "find": 25.0,
+}
+
+DEFAULT_ARM = "arm0"
+DURATION_SMOOTHING = 0.3
+MAX_FINISHED_JOBS = 200
+# Progress updates kept per job; slow readers skip the oldest ones
+MAX_JOB_UPDATES = 32
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class Job:
+    """A single queued operator request, possibly shared by several operators"""
+
+    def __init__(self, kind, query=None, arm=DEFAULT_ARM, priority=None, payload=None):
+        self.job_id = uuid.uuid4().hex[:8]
+        self.kind = kind
+        self.query = query
+        self.arm = arm
+        self.priority = JOB_PRIORITIES[kind] if priority is None else priority
+        self.payload = payload or {}
+        self.status = JOB_QUEUED
+        self.result = None
+        self.error = None
+        self.subscribers = 1
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+        self._updates = deque(maxlen=MAX_JOB_UPDATES)
+        self._update_seq = 0
+        self._update_cond = threading.Condition()
+
+    @property
+    def batch_key(self):
+        query = (self.query or "").strip().lower()
+        return (self.arm, self.kind, query)
+
+    def publish(self, update):
+        """Append a progress update for streaming readers"""
+        with self._update_cond:
+            self._update_seq += 1
+            self._updates.append((self._update_seq, update))
+            self._update_cond.notify_all()
+
+    def updates_since(self, seq, timeout=None):
+        """Return (last_seq, updates) newer than seq, waiting up to timeout for one.
+
+        Every reader keeps its own cursor, so batched subscribers all see the
+        same stream. Only the last MAX_JOB_UPDATES updates are retained.
+        """
+        with self._update_cond:
+            if self._update_seq <= seq and not self.done.is_set():
+                self._update_cond.wait(timeout)
+            updates = [update for update_seq, update in self._updates if update_seq > seq]
+            return self._update_seq, updates
+
+    def finish(self):
+        self.done.set()
+        with self._update_cond:
+            self._update_cond.notify_all()
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "query": self.query,
+            "arm": self.arm,
+            "priority": self.priority,
+            "status": self.status,
+            "subscribers": self.subscribers,
+            "result": self.result,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobScheduler:
+    """Priority job queue with one worker per arm.
+
+    Each arm has its own worker thread, so commands for one arm never
+    interleave. Identical queued requests (same arm, kind and query) are
+    merged into a single job that every submitter waits on.
+    """
+
+    def __init__(self, handlers, arms=(DEFAULT_ARM,), durations=None):
+        self.handlers = handlers
+        self.arms = tuple(arms)
+        self.durations = dict(DEFAULT_JOB_DURATIONS)
+        if durations:
+            self.durations.update(durations)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queues = {arm: [] for arm in self.arms}
+        self._running = {arm: None for arm in self.arms}
+        self._pending = {}
+        self._jobs = {}
+        self._finished = deque()
+        self._counter = itertools.count()
+        self._workers = []
+        self._stopped = False
+
+    def start(self):
+        """Start one worker thread per arm"""
+        for arm in self.arms:
+            worker = threading.Thread(target=self._worker, args=(arm,), name=f"jobs-{arm}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Job scheduler started for arms: {', '.join(self.arms)}")
+
+    def stop(self, timeout=None):
+        """Stop workers after their current job finishes"""
+        with self._lock:
+            self._stopped = True
+            self._wakeup.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def submit(self, kind, query=None, arm=DEFAULT_ARM, priority=None, payload=None):
+        """Queue a job, or join an identical job that is still waiting to run"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if arm not in self._queues:
+            raise ValueError(f"Unknown arm: {arm}")
+        job = Job(kind, query=query, arm=arm, priority=priority, payload=payload)
+        with self._lock:
+            existing = self._pending.get(job.batch_key)
+            if existing is not None:
+                existing.subscribers += 1
+                logger.info(f"Batched {kind} '{query}' into job {existing.job_id} "
+                            f"({existing.subscribers} subscribers)")
+                return existing
+            self._pending[job.batch_key] = job
+            self._jobs[job.job_id] = job
+            heapq.heappush(self._queues[arm], (job.priority, next(self._counter), job))
+            self._wakeup.notify_all()
+        logger.info(f"Queued job {job.job_id}: {kind} '{query}' on {arm}")
+        return job
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        """Return a job's state with its queue position and ETA in seconds"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            info = job.to_dict()
+            info["queue_position"], info["eta"] = self._estimate(job)
+        return info
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes and return it"""
+        job = self.get_job(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+        return job
+
+    def _estimate(self, job):
+        # Caller holds the lock
+        if job.status in (JOB_DONE, JOB_FAILED):
+            return 0, 0.0
+        now = time.time()
+        running = self._running[job.arm]
+        if job.status == JOB_RUNNING:
+            elapsed = now - job.started_at
+            return 0, max(self.durations[job.kind] - elapsed, 0.0)
+        eta = 0.0
+        if running is not None:
+            eta += max(self.durations[running.kind] - (now - running.started_at), 0.0)
+        own_key = next((priority, seq) for priority, seq, other in self._queues[job.arm] if other is job)
+        position = 1
+        for priority, seq, other in self._queues[job.arm]:
+            if (priority, seq) < own_key:
+                eta += self.durations[other.kind]
+                position += 1
+        return position, eta + self.durations[job.kind]
+
+    def _next_job(self, arm):
+        with self._lock:
+            while not self._stopped and not self._queues[arm]:
+                self._wakeup.wait()
+            if self._stopped:
+                return None
+            _, _, job = heapq.heappop(self._queues[arm])
+            # Once started, new submitters get a fresh job instead of a stale result
+            self._pending.pop(job.batch_key, None)
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            self._running[arm] = job
+            return job
+
+    def _worker(self, arm):
+        while True:
+            job = self._next_job(arm)
+            if job is None:
+                return
+            logger.info(f"Running job {job.job_id}: {job.kind} '{job.query}' on {arm}")
+            try:
+                job.result = self.handlers[job.kind](job)
+                job.status = JOB_DONE
+            except Exception as e:
+                logger.error(f"Job {job.job_id} failed: {e}")
+                job.error = str(e)
+                job.status = JOB_FAILED
+            job.finished_at = time.time()
+            with self._lock:
+                self._running[arm] = None
+                duration = job.finished_at - job.started_at
+                previous = self.durations[job.kind]
+                self.durations[job.kind] = previous + DURATION_SMOOTHING * (duration - previous)
+                # Keep recent results pollable without growing forever
+                self._finished.append(job.job_id)
+                while len(self._finished) > MAX_FINISHED_JOBS:
+                    self._jobs.pop(self._finished.popleft(), None)
+            job.finish()
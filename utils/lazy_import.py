@@ -0,0 +1,23 @@
+import importlib
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Return a module that is only executed on first attribute access.
+
+    Lets entry points keep `np = lazy_import("numpy")` at the top of the file
+    without paying the import cost until the module is actually used. Raises
+    ImportError immediately if the module is not installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
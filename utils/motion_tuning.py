@@ -0,0 +1,213 @@
+"""Per-segment speed profiles for recorded sequences, tuned from measured motion.
+
+Segment i of a sequence is the move into waypoint i. Its profile sets how
+testv4 executes it: interpolation steps, delay per step, the pause after
+arriving and the servo Acceleration register. Tuning runs every segment at
+increasing speed and keeps the fastest profile whose tracking error (present
+position behind the streamed goal) and settle time (until every joint is
+within SETTLE_TOLERANCE of the waypoint) stay within limits. The pause
+becomes the measured settle time plus a margin instead of a fixed 0.5 s.
+
+Profiles are stored in robot_sequences.json next to the positions they were
+tuned for, one per waypoint, with the distance each joint travelled (ticks):
+
+    {"key": 3, "positions": [...],
+     "profiles": [{"steps": 8, "delay": 0.03, "pause": 0.12, "acceleration": 30,
+                   "travel": [120, 340, 15, 0, 0, 0]}, ...]}
+
+Segment 0 is tuned from one start position, but at runtime the arm can come
+from anywhere. Given the actual start, profile_for falls back to
+DEFAULT_PROFILE when any joint has farther to go than it had while tuning.
+
+Segments of the grasp (from the gripper opening to it closing, see
+utils/pick_planner.py) get a tighter tracking limit, ignore the gripper when
+measuring settle time (it stalls on the object) and keep the full default
+pause so the gripper has time to close.
+
+Run tune_motion.py to tune against the arm or the simulator.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MOTOR_MODEL = "sts3215"
+GRIPPER_INDEX = 5
+
+# How testv4 executes segments without a tuned profile
+DEFAULT_PROFILE = {"steps": 15, "delay": 0.05, "pause": 0.5, "acceleration": 15}
+
+# Candidate motions, slowest first; the pause comes from the measured settle time
+CANDIDATE_PROFILES = [
+    {"steps": 15, "delay": 0.05, "acceleration": 15},
+    {"steps": 12, "delay": 0.045, "acceleration": 20},
+    {"steps": 10, "delay": 0.04, "acceleration": 25},
+    {"steps": 8, "delay": 0.035, "acceleration": 30},
+    {"steps": 6, "delay": 0.03, "acceleration": 40},
+    {"steps": 5, "delay": 0.025, "acceleration": 50},
+    {"steps": 4, "delay": 0.02, "acceleration": 60},
+]
+MAX_ACCELERATION = max(profile["acceleration"] for profile in CANDIDATE_PROFILES)
+
+MAX_TRACKING_ERROR = 150  # ticks, ~13 degrees behind the streamed goal
+GRASP_TRACKING_ERROR = 60  # ticks, near the object
+SETTLE_TOLERANCE = 15  # ticks
+MAX_SETTLE_TIME = 0.5  # s, the old fixed pause
+SETTLE_POLL_INTERVAL = 0.01  # s
+PAUSE_MARGIN = 1.5
+MIN_PAUSE = 0.05  # s
+TRIALS = 2
+
+
+def joint_travel(start, end):
+    """Distance each joint moves from start to end, in ticks"""
+    return [abs(int(b) - int(a)) for a, b in zip(start, end)]
+
+
+def profile_for(sequence, index, start=None):
+    """Profile for segment index of a sequence dict, or DEFAULT_PROFILE if untuned.
+
+    start is the position the arm actually moves from. A tuned profile is
+    only used if no joint travels farther than it did while tuning.
+    """
+    profiles = sequence.get("profiles")
+    if not profiles or len(profiles) != len(sequence["positions"]):
+        return DEFAULT_PROFILE
+    profile = profiles[index]
+    if start is not None:
+        tuned = profile.get("travel")
+        travel = joint_travel(start, sequence["positions"][index])
+        if tuned is None or any(actual > limit + SETTLE_TOLERANCE for actual, limit in zip(travel, tuned)):
+            return DEFAULT_PROFILE
+    return profile
+
+
+def segment_time(profile):
+    """Planned duration of one segment in seconds"""
+    return profile["steps"] * profile["delay"] + profile["pause"]
+
+
+def cycle_time(sequence, tuned=True):
+    """Planned duration of a whole sequence with its tuned or the default profiles"""
+    return sum(segment_time(profile_for(sequence, i) if tuned else DEFAULT_PROFILE)
+               for i in range(len(sequence["positions"])))
+
+
+def grasp_segments(positions):
+    """Indices of the segments that belong to the grasp"""
+    from utils.pick_planner import grasp_segment
+    segment = grasp_segment(positions)
+    if segment is None:
+        return set()
+    first, last = segment
+    return set(range(first, last + 1))
+
+
+def _interpolate(start, end, steps):
+    # Same waypoints as testv4.interpolate_positions
+    return [[int(a + (b - a) * step / steps) for a, b in zip(start, end)] for step in range(steps + 1)]
+
+
+class SegmentTuner:
+    """Runs segments on a motor bus and measures how well the servos follow.
+
+    bus is a FeetechMotorsBus or utils.sim_arm.SimulatedMotorBus with torque
+    enabled. Nothing else may use the bus while tuning.
+    """
+
+    def __init__(self, bus, motor_ids, trials=TRIALS):
+        self.bus = bus
+        self.motor_ids = list(motor_ids)
+        self.motor_models = [MOTOR_MODEL] * len(self.motor_ids)
+        self.trials = trials
+
+    def _write(self, data_name, values):
+        self.bus.write_with_motor_ids(motor_models=self.motor_models, motor_ids=self.motor_ids,
+                                      data_name=data_name, values=values)
+
+    def read_positions(self):
+        return [int(position) for position in self.bus.read_with_motor_ids(
+            motor_models=self.motor_models, motor_ids=self.motor_ids, data_name="Present_Position")]
+
+    def run_segment(self, end, profile, grasp=False):
+        """Move to end with profile; return (max tracking error, settle time or None, duration)"""
+        self._write("Acceleration", [profile["acceleration"]] * len(self.motor_ids))
+        joints = [i for i in range(len(self.motor_ids)) if not (grasp and i == GRIPPER_INDEX)]
+        start_time = time.perf_counter()
+        path = _interpolate(self.read_positions(), end, profile["steps"])
+        tracking_error = 0
+        next_step = time.perf_counter()
+        for goal in path:
+            self._write("Goal_Position", goal)
+            next_step += profile["delay"]
+            time.sleep(max(next_step - time.perf_counter(), 0))
+            present = self.read_positions()
+            tracking_error = max(tracking_error, max(abs(present[i] - goal[i]) for i in joints))
+        arrived = time.perf_counter()
+        settle_time = None
+        while time.perf_counter() - arrived <= MAX_SETTLE_TIME:
+            present = self.read_positions()
+            if all(abs(present[i] - end[i]) <= SETTLE_TOLERANCE for i in joints):
+                settle_time = time.perf_counter() - arrived
+                break
+            time.sleep(SETTLE_POLL_INTERVAL)
+        return tracking_error, settle_time, time.perf_counter() - start_time
+
+    def move_to(self, position):
+        """Slow default move, then let the arm come to rest"""
+        self.run_segment(position, DEFAULT_PROFILE)
+        time.sleep(DEFAULT_PROFILE["pause"])
+
+    def tune_segment(self, start, end, grasp=False):
+        """Fastest safe profile for the move start -> end, or None if even the slowest fails"""
+        limit = GRASP_TRACKING_ERROR if grasp else MAX_TRACKING_ERROR
+        best = None
+        for candidate in CANDIDATE_PROFILES:
+            settle_times = []
+            for _ in range(self.trials):
+                self.move_to(start)
+                tracking_error, settle_time, _ = self.run_segment(end, candidate, grasp)
+                logger.debug(f"{candidate}: tracking {tracking_error} ticks, settle {settle_time}")
+                if tracking_error > limit or settle_time is None:
+                    return best
+                settle_times.append(settle_time)
+            pause = min(max(max(settle_times) * PAUSE_MARGIN, MIN_PAUSE), DEFAULT_PROFILE["pause"])
+            if grasp:
+                pause = DEFAULT_PROFILE["pause"]
+            best = dict(candidate, pause=round(pause, 3))
+        return best
+
+    def tune_sequence(self, positions, start):
+        """Profiles for every segment of a sequence, starting from position start.
+
+        Segments where no candidate is safe keep DEFAULT_PROFILE. Each profile
+        records the joint travel it was tuned on (see profile_for).
+        """
+        grasp = grasp_segments(positions)
+        profiles = []
+        previous = start
+        for i, position in enumerate(positions):
+            profile = self.tune_segment(previous, position, grasp=i in grasp)
+            if profile is None:
+                logger.warning(f"Segment {i}: no candidate profile within limits, keeping the default")
+                profile = dict(DEFAULT_PROFILE)
+            profile["travel"] = joint_travel(previous, position)
+            profiles.append(profile)
+            previous = position
+        return profiles
+
+    def measure_sequence(self, positions, profiles, start):
+        """Run a sequence as testv4 executes it; return (duration in seconds, final error in ticks)"""
+        self.move_to(start)
+        start_time = time.perf_counter()
+        for position, profile in zip(positions, profiles):
+            self._write("Acceleration", [profile["acceleration"]] * len(self.motor_ids))
+            next_step = time.perf_counter()
+            for goal in _interpolate(self.read_positions(), position, profile["steps"]):
+                self._write("Goal_Position", goal)
+                next_step += profile["delay"]
+                time.sleep(max(next_step - time.perf_counter(), 0))
+            time.sleep(profile["pause"])
+        duration = time.perf_counter() - start_time
+        final_error = max(abs(a - b) for a, b in zip(self.read_positions(), positions[-1]))
+        return duration, final_error
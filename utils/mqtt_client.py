@@ -1,7 +1,10 @@
-import paho.mqtt.client as mqtt
 import json
 import logging
 import threading
+from utils.lazy_import import lazy_import
+from utils.status_protocol import decode_status
+
+mqtt = lazy_import("paho.mqtt.client")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -10,13 +13,16 @@ MQTT_BROKER = "10.0.0.42"  # Linux machine's IP
 MQTT_PORT = 1883
 TOPIC_COMMAND = "smartreach/command"
 TOPIC_STATUS = "smartreach/status"
+TOPIC_TELEMETRY = "smartreach/telemetry"
+ACTION_TIMEOUT = 120.0  # s, well beyond the longest recorded sequence
 
-client = mqtt.Client()
-action_done_event = threading.Event()
+client = None  # Created on first use so importing this module stays cheap
+status_listeners = []
+latest_telemetry = {}
 
 def on_connect(client, userdata, flags, rc):
     logger.info(f"Connected to MQTT broker with result code {rc}")
-    client.subscribe(TOPIC_STATUS)
+    client.subscribe([(TOPIC_STATUS, 1), (TOPIC_TELEMETRY, 0)])
 
 def on_disconnect(client, userdata, rc):
     if rc != 0:
@@ -25,23 +31,101 @@ def on_disconnect(client, userdata, rc):
         logger.info("Disconnected from MQTT broker")
 
 def on_message(client, userdata, msg):
-    logger.info(f"Received message on topic {msg.topic}: {msg.payload.decode()}")
+    if msg.topic == TOPIC_TELEMETRY:
+        try:
+            latest_telemetry.update(json.loads(msg.payload))
+        except Exception as e:
+            logger.error(f"Error decoding telemetry frame: {e}")
+        return
     try:
-        data = json.loads(msg.payload.decode())
-        if data.get("status") in ["done", "completed"]:
-            action_done_event.set()
+        messages = decode_status(msg.payload)
     except Exception as e:
-        logger.error(f"Error processing status message: {e}")
+        logger.error(f"Error decoding status message on {msg.topic}: {e}")
+        return
+    for data in messages:
+        # Progress arrives at waypoint rate; keep it out of the INFO log
+        if data.get("status") == "in_progress":
+            logger.debug(f"Status on {msg.topic}: {data}")
+        else:
+            logger.info(f"Status on {msg.topic}: {data}")
+        try:
+            for listener in list(status_listeners):
+                listener(data)
+        except Exception as e:
+            logger.error(f"Error processing status message: {e}")
+
+class ActionFailed(Exception):
+    """The controller reported an error for a command, or never finished it"""
+
+class ActionStopped(ActionFailed):
+    """The operator stopped the arm before the command finished; send no further moves"""
+
+def run_action(send, position_key, timeout=ACTION_TIMEOUT, on_status=None):
+    """Publish a command with send() and block until the controller completes position_key.
+
+    Raises ActionFailed when the controller reports an error (errors without
+    a position_key, such as a bad command, count too) or nothing completes
+    within timeout seconds, and ActionStopped when the arm was stopped before
+    finishing position_key. on_status(data) sees every status for position_key.
+    """
+    outcome = {}
+    finished = threading.Event()
+
+    def listener(data):
+        status, key = data.get("status"), data.get("position_key")
+        if key == position_key and on_status is not None:
+            on_status(data)
+        if status == "completed" and key == position_key:
+            finished.set()
+        elif status == "error" and key in (position_key, None):
+            outcome["error"] = data.get("error_message", "unknown error")
+            finished.set()
+        elif status == "stopped" and key == position_key:
+            outcome["stopped"] = True
+            finished.set()
+
+    # Listen before sending so a fast reply can't be missed
+    add_status_listener(listener)
+    try:
+        send()
+        if not finished.wait(timeout):
+            raise ActionFailed(f"Position {position_key} did not complete within {timeout:.0f}s")
+    finally:
+        remove_status_listener(listener)
+    if "error" in outcome:
+        raise ActionFailed(f"Position {position_key} failed: {outcome['error']}")
+    if "stopped" in outcome:
+        raise ActionStopped(f"Position {position_key} was stopped")
+
+def get_joint_state():
+    """Most recent present joint positions reported by the controller, or None"""
+    return latest_telemetry.get("present")
+
+def add_status_listener(listener):
+    """Call listener(data) for every status message from the controller"""
+    status_listeners.append(listener)
+
+def remove_status_listener(listener):
+    if listener in status_listeners:
+        status_listeners.remove(listener)
+
+def get_client():
+    global client
+    if client is None:
+        client = mqtt.Client()
+        client.on_connect = on_connect
+        client.on_disconnect = on_disconnect
+        client.on_message = on_message
+    return client
 
 def start_mqtt_client():
-    client.on_connect = on_connect
-    client.on_disconnect = on_disconnect
-    client.on_message = on_message
     logger.info(f"Connecting to MQTT broker at {MQTT_BROKER}:{MQTT_PORT}")
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    get_client().connect(MQTT_BROKER, MQTT_PORT, 60)
     client.loop_start()
 
 def stop_mqtt_client():
+    if client is None:
+        return
     client.loop_stop()
     client.disconnect()
 
@@ -52,6 +136,15 @@ def send_position_command(position_key):
     }
     message = json.dumps(payload)
     logger.info(f"Publishing message: {message}")
-    client.publish(TOPIC_COMMAND, message)
-    # Clear event for the next action
-    action_done_event.clear()
\ No newline at end of file
+    get_client().publish(TOPIC_COMMAND, message)
+
+def send_positions_command(positions, position_key):
+    """Execute explicit waypoints, reported under position_key in status messages"""
+    payload = {
+        "command": "execute_positions",
+        "position_key": position_key,
+        "positions": [[int(value) for value in position] for position in positions]
+    }
+    message = json.dumps(payload)
+    logger.info(f"Publishing {len(positions)} planned positions for key {position_key}")
+    get_client().publish(TOPIC_COMMAND, message)
@@ -0,0 +1,91 @@
+"""Adjust recorded pick sequences to where the object was actually detected.
+
+A recorded pick sequence opens the gripper, reaches down and closes it on
+the object. The waypoints from the gripper opening to the gripper closing
+form the grasp segment. When the object sits off the recorded spot, those
+waypoints are moved by the detected table offset. Each one is re-solved with
+IK at its recorded height, keeping its gripper pitch where reachable. The
+approach and retreat waypoints are left as recorded.
+
+Nothing is planned while IK.CALIBRATED is off, and a plan that moves any arm
+joint more than MAX_JOINT_CHANGE_TICKS from its recorded waypoint is
+rejected, so a geometry error or an elbow flip can't reach the arm.
+"""
+import logging
+import numpy as np
+import IK
+
+logger = logging.getLogger(__name__)
+
+GRIPPER_INDEX = 5
+GRIPPER_CHANGE_TICKS = 500  # A jump this large between waypoints is an open/close
+MAX_CORRECTION_MM = 80.0  # Beyond this, trust a new search over an extrapolated pick
+MAX_JOINT_CHANGE_TICKS = 150  # About 13 degrees from the recorded waypoint
+
+
+def grasp_segment(positions):
+    """(first, last) waypoint indices of the grasp segment, or None if not found"""
+    gripper = [position[GRIPPER_INDEX] for position in positions]
+    opened = None
+    for i in range(1, len(gripper)):
+        change = gripper[i] - gripper[i - 1]
+        if opened is None and change > GRIPPER_CHANGE_TICKS:
+            opened = i
+        elif opened is not None and change < -GRIPPER_CHANGE_TICKS:
+            return opened, i
+    return None
+
+
+def plan_pick(positions, offset_mm, max_correction=MAX_CORRECTION_MM, max_joint_change=MAX_JOINT_CHANGE_TICKS):
+    """Return the pick waypoints shifted by offset_mm (dx, dy), or None if not possible.
+
+    None means IK is uncalibrated, the sequence has no recognizable grasp, the
+    offset is too large, IK can't reach the shifted grasp, or a joint would
+    move too far from its recorded waypoint; the caller should fall back to
+    the recorded sequence.
+    """
+    if not IK.CALIBRATED:
+        logger.info("IK geometry is uncalibrated (see bench_ik.py), not adjusting the pick")
+        return None
+    offset = np.asarray(offset_mm, dtype=np.float64)
+    if np.linalg.norm(offset) > max_correction:
+        logger.info(f"Pick correction {offset.round(1).tolist()} mm exceeds {max_correction} mm")
+        return None
+    segment = grasp_segment(positions)
+    if segment is None:
+        logger.info("No gripper open/close found in the pick sequence")
+        return None
+    first, last = segment
+
+    ticks = np.asarray(positions[first:last + 1])
+    q0 = IK.ticks_to_radians(ticks)
+    targets = IK.forward_kinematics(q0)
+    targets[:, :2] += offset
+    q, error, converged = IK.solve_ik(targets, q0=q0, pitch=IK.gripper_pitch(q0))
+    if not converged.all():
+        # Keeping the recorded gripper angle is a preference; give it up before giving up the pick
+        q_free, error_free, converged_free = IK.solve_ik(targets[~converged], q0=q0[~converged])
+        q[~converged], error[~converged] = q_free, error_free
+        converged[~converged] = converged_free
+    if not converged.all():
+        logger.info(f"Shifted grasp out of reach (error up to {error.max():.1f} mm)")
+        return None
+
+    planned_ticks = IK.radians_to_ticks(q)
+    change = np.abs(planned_ticks - ticks[:, :IK.ARM_JOINTS]).max()
+    if change > max_joint_change:
+        logger.info(f"Shifted grasp moves a joint {change} ticks from the recorded pick (limit {max_joint_change})")
+        return None
+
+    planned = [list(position) for position in positions]
+    for i, arm_ticks in enumerate(planned_ticks):
+        planned[first + i][:IK.ARM_JOINTS] = [int(tick) for tick in arm_ticks]
+    return planned
+
+
+def grasp_point(positions):
+    """Table (x, y) in mm where a pick sequence closes the gripper"""
+    segment = grasp_segment(positions)
+    if segment is None:
+        return None
+    return IK.forward_kinematics_ticks(positions[segment[1]])[0, :2]
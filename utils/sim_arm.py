@@ -0,0 +1,66 @@
+"""Simulated Feetech motor bus for running controller code without the arm.
+
+Implements the subset of FeetechMotorsBus used in this repo
+(connect/disconnect, read_with_motor_ids, write_with_motor_ids). Each servo
+tracks its goal like a first-order lag under a velocity limit that scales
+with its Acceleration register. Present_Position advances in real time
+between reads. Other registers are stored and read back as written.
+"""
+import threading
+import time
+
+DEFAULT_POSITION = 2048
+TIME_CONSTANT = 0.08  # s, how quickly a servo closes the gap to its goal
+MAX_VELOCITY = 3000.0  # ticks/s at the reference acceleration
+REFERENCE_ACCELERATION = 15
+
+
+class SimulatedMotorBus:
+    def __init__(self, motor_ids=(1, 2, 3, 4, 5, 6), initial_positions=None,
+                 time_constant=TIME_CONSTANT, max_velocity=MAX_VELOCITY):
+        positions = initial_positions or [DEFAULT_POSITION] * len(motor_ids)
+        self.time_constant = time_constant
+        self.max_velocity = max_velocity
+        self.registers = {motor_id: {"Present_Position": float(position), "Goal_Position": float(position),
+                                     "Torque_Enable": 0, "Acceleration": REFERENCE_ACCELERATION}
+                          for motor_id, position in zip(motor_ids, positions)}
+        self.reads = 0
+        self.writes = 0
+        self._last_update = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def _advance(self):
+        now = time.perf_counter()
+        dt = now - self._last_update
+        self._last_update = now
+        for registers in self.registers.values():
+            if not registers["Torque_Enable"]:
+                continue
+            gap = registers["Goal_Position"] - registers["Present_Position"]
+            limit = self.max_velocity * max(registers["Acceleration"], 1) / REFERENCE_ACCELERATION * dt
+            step = gap * min(dt / self.time_constant, 1.0)
+            registers["Present_Position"] += max(-limit, min(limit, step))
+
+    def read_with_motor_ids(self, motor_models, motor_ids, data_name):
+        with self._lock:
+            self._advance()
+            self.reads += 1
+            values = [self.registers[motor_id].get(data_name, 0) for motor_id in motor_ids]
+        if data_name == "Present_Position":
+            return [int(round(value)) for value in values]
+        return values
+
+    def write_with_motor_ids(self, motor_models, motor_ids, data_name, values):
+        if not isinstance(values, (list, tuple)):
+            values = [values] * len(motor_ids)
+        with self._lock:
+            self._advance()
+            self.writes += 1
+            for motor_id, value in zip(motor_ids, values):
+                self.registers[motor_id][data_name] = value
@@ -0,0 +1,228 @@
+import json
+import struct
+import threading
+import time
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Bump when fields or the binary layout change
+SCHEMA_VERSION = 2
+
+ENCODING_JSON = "json"
+ENCODING_STRUCT = "struct"
+ENCODING_MSGPACK = "msgpack"
+
+STATUS_CODES = {
+    "received": 1,
+    "started": 2,
+    "in_progress": 3,
+    "completed": 4,
+    "error": 5,
+    "initialized": 6,
+    "shutdown": 7,
+    "batch": 8,
+    "stopped": 9,
+}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# Progress is superseded by the next update, so losing one is harmless.
+# Anything a caller waits on must arrive.
+STATUS_QOS = {
+    "received": 0,
+    "in_progress": 0,
+    "batch": 0,
+    "started": 1,
+    "completed": 1,
+    "error": 1,
+    "initialized": 1,
+    "shutdown": 1,
+    "stopped": 1,
+}
+
+# Binary layout: magic, version, status code, then a fixed record and an
+# optional UTF-8 tail (error message or position name). The record starts with
+# a bitmask of the integer fields present, so every int16 value (including a
+# position_key of -1) round-trips.
+STRUCT_MAGIC = 0xA5
+STRUCT_HEADER = struct.Struct("<BBB")
+STRUCT_RECORD = struct.Struct("<Bhhhd")
+STRUCT_COUNT = struct.Struct("<H")
+STRUCT_FIELDS = ("position_key", "position_index", "total_positions")
+# Version 1 records had no bitmask and marked missing fields with -1
+STRUCT_RECORD_V1 = struct.Struct("<hhhd")
+STRUCT_MISSING_V1 = -1
+
+
+def _record_fields(message):
+    present = 0
+    values = []
+    for bit, name in enumerate(STRUCT_FIELDS):
+        field = message.get(name)
+        if field is None:
+            values.append(0)
+            continue
+        if not isinstance(field, int) or isinstance(field, bool):
+            raise TypeError(f"{name} must be an integer for the struct encoding, got {field!r}")
+        present |= 1 << bit
+        values.append(field)
+    return (present, *values, float(message.get("timestamp", 0.0)))
+
+
+def _unpack_record(version, payload, offset):
+    """Return (message fields, record size) for the record at offset"""
+    if version == 1:
+        values = STRUCT_RECORD_V1.unpack_from(payload, offset)
+        fields = {name: field for name, field in zip(STRUCT_FIELDS, values[:3]) if field != STRUCT_MISSING_V1}
+        fields["timestamp"] = values[3]
+        return fields, STRUCT_RECORD_V1.size
+    present, *values, timestamp = STRUCT_RECORD.unpack_from(payload, offset)
+    fields = {name: field for bit, (name, field) in enumerate(zip(STRUCT_FIELDS, values)) if present & (1 << bit)}
+    fields["timestamp"] = timestamp
+    return fields, STRUCT_RECORD.size
+
+
+def _encode_struct(message):
+    status = message["status"]
+    header = STRUCT_HEADER.pack(STRUCT_MAGIC, SCHEMA_VERSION, STATUS_CODES[status])
+    if status == "batch":
+        updates = message["updates"]
+        body = b"".join(STRUCT_RECORD.pack(*_record_fields(update)) for update in updates)
+        return header + STRUCT_COUNT.pack(len(updates)) + body
+    tail = message.get("error_message") or message.get("position") or ""
+    return header + STRUCT_RECORD.pack(*_record_fields(message)) + tail.encode("utf-8")
+
+
+def _decode_struct(payload):
+    _, version, code = STRUCT_HEADER.unpack_from(payload)
+    status = STATUS_NAMES[code]
+    offset = STRUCT_HEADER.size
+    if status == "batch":
+        (count,) = STRUCT_COUNT.unpack_from(payload, offset)
+        offset += STRUCT_COUNT.size
+        updates = []
+        for _ in range(count):
+            fields, size = _unpack_record(version, payload, offset)
+            updates.append(fields)
+            offset += size
+        return {"v": version, "status": "batch", "updates": updates}
+    fields, size = _unpack_record(version, payload, offset)
+    message = dict(fields, v=version, status=status)
+    tail = payload[offset + size:].decode("utf-8")
+    if tail:
+        message["error_message" if status == "error" else "position"] = tail
+    return message
+
+
+def make_status(status, **fields):
+    """Build a versioned status message"""
+    message = {"v": SCHEMA_VERSION, "status": status}
+    message.update(fields)
+    message.setdefault("timestamp", time.time())
+    return message
+
+
+def encode_status(message, encoding=ENCODING_JSON):
+    """Serialize a status message for MQTT.
+
+    Messages the struct layout can't hold (keys or indices that aren't
+    int16 integers) are sent as JSON instead; decode_status reads both.
+    """
+    if encoding == ENCODING_STRUCT:
+        try:
+            return _encode_struct(message)
+        except (TypeError, struct.error):
+            pass
+    if encoding == ENCODING_MSGPACK:
+        if msgpack is None:
+            raise ImportError("msgpack is not installed; use the json or struct encoding")
+        return msgpack.packb(message)
+    return json.dumps(message, separators=(",", ":"))
+
+
+def decode_status(payload):
+    """Parse a status payload in any supported encoding into a list of messages.
+
+    Batches are expanded into their individual progress updates. Legacy
+    (unversioned) JSON messages are accepted as schema version 0.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    if payload[:1] == b"{":
+        message = json.loads(payload)
+    elif payload[0] == STRUCT_MAGIC:
+        message = _decode_struct(payload)
+    elif msgpack is not None:
+        message = msgpack.unpackb(payload)
+    else:
+        raise ValueError("Binary status payload received but msgpack is not installed")
+    message.setdefault("v", 0)
+    if message.get("status") == "batch":
+        # Updates inside a batch leave out the fields they all share
+        return [dict(update, v=message["v"], status="in_progress") for update in message["updates"]]
+    return [message]
+
+
+class StatusPublisher:
+    """Publish status messages with per-type QoS and coalesced progress.
+
+    In-progress updates arriving faster than batch_interval are held and sent
+    together as one "batch" message. Any other status flushes pending progress
+    first, so consumers always see updates in order. Sending happens under a
+    lock, so a timer flush can't overtake a status published after it.
+    """
+
+    def __init__(self, client, topic, encoding=ENCODING_JSON, batch_interval=0.2):
+        self.client = client
+        self.topic = topic
+        self.encoding = encoding
+        self.batch_interval = batch_interval
+        self._pending = []
+        self._last_flush = 0.0
+        self._timer = None
+        self._lock = threading.Lock()
+        self._send_lock = threading.RLock()
+
+    def publish(self, status, **fields):
+        message = make_status(status, **fields)
+        if status == "in_progress" and self.batch_interval > 0:
+            self._add_progress(message)
+        else:
+            with self._send_lock:
+                self.flush()
+                self._send(message)
+        return message
+
+    def flush(self):
+        """Send any held progress updates now"""
+        with self._send_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = []
+                self._last_flush = time.monotonic()
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if len(pending) == 1:
+                self._send(pending[0])
+            elif pending:
+                updates = [{name: value for name, value in update.items() if name not in ("v", "status")}
+                           for update in pending]
+                self._send(make_status("batch", updates=updates))
+
+    def _add_progress(self, message):
+        with self._lock:
+            self._pending.append(message)
+            due = time.monotonic() - self._last_flush >= self.batch_interval
+            if not due and self._timer is None:
+                self._timer = threading.Timer(self.batch_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def _send(self, message):
+        payload = encode_status(message, self.encoding)
+        self.client.publish(self.topic, payload, qos=STATUS_QOS.get(message["status"], 1))
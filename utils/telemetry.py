@@ -0,0 +1,291 @@
+"""Joint telemetry: fixed-rate sampling, MQTT frames and a bounded on-disk log.
+
+The log is a directory of compressed NumPy chunks, one column per array:
+
+    t             float64  sample time (time.time())
+    command_id    int64    id of the command being executed, -1 when idle
+    sequence_key  int16    sequence key of that command, -1 when idle
+    present       int16    (N, joints) Present_Position
+    goal          int16    (N, joints) last Goal_Position written
+
+Chunk file names carry their time range so queries only open the chunks
+they need. A chunk is written when it holds CHUNK_SAMPLES samples, spans
+FLUSH_INTERVAL seconds, or a command ends, so a finished run can be queried
+right away and a crash loses at most the last interval. The oldest chunks are deleted once the directory exceeds its
+byte budget.
+
+Query from the command line:
+
+    python -m utils.telemetry --dir telemetry --command 1760870400123 --summary
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_DIR = "telemetry"
+TELEMETRY_TOPIC = "smartreach/telemetry"
+SAMPLE_RATE_HZ = 50
+IDLE_RATE_HZ = 1  # Between commands the arm holds still; sample (and publish every sample) slowly
+PUBLISH_EVERY = 10  # Publish every Nth sample over MQTT (5 Hz at 50 Hz sampling)
+CHUNK_SAMPLES = 3000  # One minute per chunk at 50 Hz
+FLUSH_INTERVAL = 60.0  # s; at the idle rate a chunk would otherwise take 50 minutes to fill
+MAX_LOG_BYTES = 200 * 1024 * 1024
+NO_COMMAND = -1
+
+
+class TelemetryLog:
+    """Append-only columnar log split into rotating compressed chunks"""
+
+    def __init__(self, directory=TELEMETRY_DIR, chunk_samples=CHUNK_SAMPLES, max_bytes=MAX_LOG_BYTES,
+                 flush_interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.chunk_samples = chunk_samples
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self._columns = {"t": [], "command_id": [], "sequence_key": [], "present": [], "goal": []}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, t, command_id, sequence_key, present, goal):
+        with self._lock:
+            self._columns["t"].append(t)
+            self._columns["command_id"].append(command_id)
+            self._columns["sequence_key"].append(sequence_key)
+            self._columns["present"].append(present)
+            self._columns["goal"].append(goal)
+            full = (len(self._columns["t"]) >= self.chunk_samples
+                    or t - self._columns["t"][0] >= self.flush_interval)
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write buffered samples as a new chunk and enforce the disk budget"""
+        with self._lock:
+            columns = self._columns
+            if not columns["t"]:
+                return
+            self._columns = {name: [] for name in columns}
+        t = np.asarray(columns["t"], dtype=np.float64)
+        path = os.path.join(self.directory, f"telemetry_{t[0]:.3f}_{t[-1]:.3f}.npz")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez_compressed(
+                file,
+                t=t,
+                command_id=np.asarray(columns["command_id"], dtype=np.int64),
+                sequence_key=np.asarray(columns["sequence_key"], dtype=np.int16),
+                present=np.asarray(columns["present"], dtype=np.int16),
+                goal=np.asarray(columns["goal"], dtype=np.int16),
+            )
+        os.replace(tmp_path, path)
+        self._rotate()
+
+    def _rotate(self):
+        chunks = list_chunks(self.directory)
+        sizes = [os.path.getsize(path) for _, _, path in chunks]
+        total = sum(sizes)
+        for (_, _, path), size in zip(chunks, sizes):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            logger.info(f"Telemetry log over budget, removed {os.path.basename(path)}")
+
+
+class TelemetrySampler:
+    """Sample joint state at a fixed rate into a TelemetryLog and over MQTT.
+
+    read_present and read_goal are callables returning one value per joint.
+    The sampler holds no lock of its own on the motor bus; read_present must
+    be safe to call from the sampler thread. Outside commands it drops to
+    idle_rate_hz and returns to full rate as soon as begin_command() is called.
+    """
+
+    def __init__(self, read_present, read_goal, log=None, mqtt_client=None,
+                 rate_hz=SAMPLE_RATE_HZ, publish_every=PUBLISH_EVERY, topic=TELEMETRY_TOPIC,
+                 idle_rate_hz=IDLE_RATE_HZ):
+        self.read_present = read_present
+        self.read_goal = read_goal
+        self.log = log
+        self.mqtt_client = mqtt_client
+        self.period = 1.0 / rate_hz
+        self.idle_period = 1.0 / idle_rate_hz
+        self.publish_every = publish_every
+        self.topic = topic
+        self.command_id = NO_COMMAND
+        self.sequence_key = NO_COMMAND
+        self._last_command_id = NO_COMMAND
+        self._id_lock = threading.Lock()
+        self._flush_requested = False
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def begin_command(self, sequence_key):
+        """Tag following samples with a new command id and return it"""
+        self.sequence_key = sequence_key
+        self.command_id = self._next_command_id()
+        self._wake.set()
+        return self.command_id
+
+    def _next_command_id(self):
+        # Milliseconds since the epoch, bumped past the previous id, so ids
+        # never repeat across restarts and sort in the order commands ran
+        with self._id_lock:
+            self._last_command_id = max(time.time_ns() // 1_000_000, self._last_command_id + 1)
+            return self._last_command_id
+
+    def end_command(self):
+        """Stop tagging samples; the sampler thread writes the command's samples to disk"""
+        self.command_id = NO_COMMAND
+        self.sequence_key = NO_COMMAND
+        self._flush_requested = True
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.log is not None:
+            self.log.flush()
+
+    def _run(self):
+        count = 0
+        next_sample = time.perf_counter()
+        while not self._stop.is_set():
+            idle = self.command_id == NO_COMMAND
+            try:
+                present = list(self.read_present())
+                goal = list(self.read_goal())
+            except Exception as e:
+                logger.warning(f"Telemetry read failed: {e}")
+            else:
+                t = time.time()
+                if self.log is not None:
+                    self.log.append(t, self.command_id, self.sequence_key, present, goal)
+                    if self._flush_requested and idle:
+                        # First idle sample after a command: make the run queryable now
+                        self._flush_requested = False
+                        self.log.flush()
+                if self.mqtt_client is not None and (idle or count % self.publish_every == 0):
+                    frame = {"t": t, "cmd": self.command_id, "key": self.sequence_key,
+                             "present": present, "goal": goal}
+                    self.mqtt_client.publish(self.topic, json.dumps(frame, separators=(",", ":")), qos=0)
+                count += 1
+            # Schedule against absolute deadlines so the rate doesn't drift
+            next_sample += self.idle_period if idle else self.period
+            delay = next_sample - time.perf_counter()
+            if delay < 0:
+                next_sample = time.perf_counter()
+                delay = 0
+            if self._wake.wait(delay):
+                # A command started; sample it from its first moment
+                self._wake.clear()
+                next_sample = time.perf_counter()
+
+
+def list_chunks(directory=TELEMETRY_DIR):
+    """Return (start, end, path) for each chunk, oldest first"""
+    chunks = []
+    for path in glob.glob(os.path.join(directory, "telemetry_*.npz")):
+        start, end = os.path.basename(path)[len("telemetry_"):-len(".npz")].split("_")
+        chunks.append((float(start), float(end), path))
+    return sorted(chunks)
+
+
+def load_telemetry(directory=TELEMETRY_DIR, start=None, end=None, command_id=None):
+    """Load samples within [start, end] and/or for one command id as a dict of arrays"""
+    parts = []
+    for chunk_start, chunk_end, path in list_chunks(directory):
+        if start is not None and chunk_end < start:
+            continue
+        if end is not None and chunk_start > end:
+            continue
+        with np.load(path) as chunk:
+            columns = {name: chunk[name] for name in chunk.files}
+        mask = np.ones(len(columns["t"]), dtype=bool)
+        if start is not None:
+            mask &= columns["t"] >= start
+        if end is not None:
+            mask &= columns["t"] <= end
+        if command_id is not None:
+            mask &= columns["command_id"] == command_id
+        if mask.any():
+            parts.append({name: values[mask] for name, values in columns.items()})
+    if not parts:
+        return None
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def summarize(samples):
+    """Per-command cycle time and tracking error (present vs goal, in ticks)"""
+    summary = []
+    for command_id in np.unique(samples["command_id"]):
+        if command_id == NO_COMMAND:
+            continue
+        mask = samples["command_id"] == command_id
+        t = samples["t"][mask]
+        error = np.abs(samples["present"][mask].astype(np.int32) - samples["goal"][mask])
+        summary.append({
+            "command_id": int(command_id),
+            "sequence_key": int(samples["sequence_key"][mask][0]),
+            "samples": int(mask.sum()),
+            "cycle_time": float(t[-1] - t[0]),
+            "mean_tracking_error": error.mean(axis=0).round(1).tolist(),
+            "max_tracking_error": error.max(axis=0).tolist(),
+        })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slice the joint telemetry log")
+    parser.add_argument("--dir", default=TELEMETRY_DIR)
+    parser.add_argument("--start", type=float, help="Unix time of the first sample")
+    parser.add_argument("--end", type=float, help="Unix time of the last sample")
+    parser.add_argument("--last", type=float, help="Only the last N seconds of the log")
+    parser.add_argument("--command", type=int, help="Only samples of this command id")
+    parser.add_argument("--summary", action="store_true", help="Print per-command cycle time and tracking error")
+    parser.add_argument("--csv", help="Write the selected samples to this CSV file")
+    args = parser.parse_args()
+
+    start = args.start
+    if args.last is not None:
+        chunks = list_chunks(args.dir)
+        if chunks:
+            start = chunks[-1][1] - args.last
+    samples = load_telemetry(args.dir, start=start, end=args.end, command_id=args.command)
+    if samples is None:
+        print("No samples match.")
+        return
+    print(f"{len(samples['t'])} samples from {samples['t'][0]:.3f} to {samples['t'][-1]:.3f}")
+
+    if args.summary:
+        for entry in summarize(samples):
+            print(json.dumps(entry))
+    if args.csv:
+        joints = samples["present"].shape[1]
+        header = ["t", "command_id", "sequence_key"]
+        header += [f"present_{j + 1}" for j in range(joints)] + [f"goal_{j + 1}" for j in range(joints)]
+        table = np.column_stack([samples["t"], samples["command_id"], samples["sequence_key"],
+                                 samples["present"], samples["goal"]])
+        np.savetxt(args.csv, table, delimiter=",", header=",".join(header), comments="", fmt="%.6f")
+        print(f"Wrote {args.csv}")
+
+
+if __name__ == "__main__":
+    main()